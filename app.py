@@ -1,72 +1,106 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
 import plotly.express as px
-import re
+import os
+
+from fishlog import (
+    BAIT_TAXONOMY,
+    PAGE_SIZES,
+    SOURCE_COLUMN,
+    Diagnostics,
+    filter_index,
+    frame_sketches,
+    ingest_fishlog_bytes,
+    ingest_fishlog_files,
+    memory_report,
+    page_count,
+    quantile_flags,
+    quarantine_of,
+    query_aggregates,
+    record_page,
+    source_flags,
+)
+
+# Правила позначення трофеїв (синій колір): частка максимуму виду
+# або квантиль ваги виду (загалом, на базі чи на локації) з ескізів розподілу ваги
+TROPHY_RULES = {
+    "80% максимуму виду": None,
+    "p90 виду": (0.9, "fish"),
+    "p99 виду": (0.99, "fish"),
+    "p90 виду на базі": (0.9, "base"),
+    "p99 виду на базі": (0.99, "base"),
+    "p90 виду на локації": (0.9, "location"),
+    "p99 виду на локації": (0.99, "location"),
+}
 
 # Налаштування сторінки
 st.set_page_config(page_title="Аналіз риболовлі", layout="wide")
 st.title("Аналіз риболовлі")
 
+# Діагностика продуктивності вмикається вручну (або FISHLOG_DIAGNOSTICS=1):
+# кожен етап сторінки записує час, рядки на вході/виході та зміну пам'яті
+with st.sidebar:
+    diag = Diagnostics(st.checkbox("Діагностика продуктивності", value=os.environ.get("FISHLOG_DIAGNOSTICS") == "1",
+                                   help="Час, рядки та пам'ять кожного етапу обробки", key="diagnostics"))
+
 # Віджет для завантаження файлу
 st.header("Завантаження даних")
-uploaded_file = st.file_uploader("Виберіть файл Fishlog.txt", type=["txt"], help="Завантажте файл Fishlog.txt для аналізу")
+uploaded_files = st.file_uploader("Виберіть файли Fishlog.txt", type=["txt"], accept_multiple_files=True,
+                                  help="Завантажте один або кілька файлів Fishlog.txt (різних гравців чи сесій) для аналізу")
 
 # Ініціалізація base_df
 base_df = None
-max_weights = {}
-
-# Функція для визначення типу наживки
-def classify_bait(bait):
-    if pd.isna(bait):
-        return None
-    bait = str(bait).strip()
-    if bait.startswith("Circl"):
-        return "Вертушки"
-    elif bait.startswith("Devon"):
-        return "Девони"
-    elif bait.startswith("Musca"):
-        return "Мушки"
-    elif bait.startswith("Pilk"):
-        return "Пілкери"
-    elif bait.startswith("Pop"):
-        return "Попери"
-    elif bait.startswith("Tvis"):
-        return "Твістери"
-    elif bait.startswith("Vib"):
-        return "Вібро"
-    elif bait.startswith("Vob"):
-        return "Воблери"
-    elif bait.startswith("Spinner"):
-        return "Спінери"
-    else:
-        return "Всі Біо"
+
+# Прогрес фонового розбору: фрагмент оновлюється сам, поки файл не розібрано повністю
+@st.fragment(run_every=0.5)
+def show_ingest_progress(job):
+    progress = job.progress()
+    st.progress(progress.fraction, text=f"Обробка файлу: {progress.rows} рядків, "
+                                        f"відхилено {progress.rejected}, "
+                                        f"{progress.bytes_done / 2**20:.1f} з {progress.bytes_total / 2**20:.1f} МБ")
+    if job.done:
+        st.rerun()
+    provisional = job.provisional()
+    if provisional is not None:
+        st.write(f"Попередні підсумки по рибі (оброблено записів: {provisional.count}):")
+        st.dataframe(provisional.summary('fish'), use_container_width=True)
 
 # Обробка завантаженого файлу
-if uploaded_file is not None:
+if uploaded_files:
     try:
-        with st.spinner("Обробка файлу..."):
-            # Зчитуємо файл
-            base_df = pd.read_csv(uploaded_file, sep=":", names=["fish", "weight", "bait", "base", "location", "id", "time", "depth"], header=None)
-            # Обробка стовпця time
-            base_df["time"] = base_df["time"].str.replace("-", ":")
-            base_df["time"] = pd.to_datetime(base_df["time"], format="%H:%M")
-            base_df["time"] = base_df["time"].dt.strftime("%H:%M")
-            # Валідація числових стовпців
-            base_df['weight'] = pd.to_numeric(base_df['weight'], errors='coerce')
-            base_df['depth'] = pd.to_numeric(base_df['depth'], errors='coerce')
-            base_df['id'] = pd.to_numeric(base_df['id'], errors='coerce')
-            base_df = base_df.dropna(subset=['weight', 'depth', 'id'])
-            # Додаємо стовпець із типом наживки
-            base_df['bait_type'] = base_df['bait'].apply(classify_bait)
-            # Видаляємо записи з невідомими типами наживок
-            base_df = base_df[base_df['bait_type'].notna()]
-            # Обчислюємо максимальну вагу для кожного виду риби (id ≤ 9999)
-            max_weights = base_df[base_df['id'] <= 9999].groupby('fish')['weight'].max().to_dict()
-        st.success("Файл успішно завантажено")
+        # Файли розбираються фрагментами у фоні. Завдання зберігається в сесії, тож
+        # перезапуски сторінки не хешують вміст заново; готовий розбір кешується за хешем.
+        # Кілька файлів розбираються паралельно і зливаються з позначкою джерела
+        file_ids = tuple(uploaded_file.file_id for uploaded_file in uploaded_files)
+        ingest = st.session_state.get("ingest")
+        if ingest is None or ingest[0] != file_ids:
+            if len(uploaded_files) == 1:
+                job = ingest_fishlog_bytes(uploaded_files[0].getvalue())
+            else:
+                job = ingest_fishlog_files([(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files])
+            ingest = (file_ids, job)
+            st.session_state.ingest = ingest
+        job = ingest[1]
     except Exception as e:
         st.error(f"Помилка при читанні файлу: {str(e)}")
         st.stop()
+    if not job.done:
+        show_ingest_progress(job)
+        st.stop()
+    if job.error is not None:
+        st.error(f"Помилка при читанні файлу: {str(job.error)}")
+        st.stop()
+    base_df = job.df
+    progress = job.progress()
+    diag.record("Розбір файлу", progress.elapsed, rows_in=progress.rows + progress.rejected, rows_out=progress.rows)
+    st.success("Файл успішно завантажено")
+    # Некоректні рядки не зникають мовчки: показуємо їх кількість і самі рядки з номерами
+    quarantine = quarantine_of(base_df)
+    if len(quarantine):
+        st.warning(f"Відхилено некоректних рядків: {len(quarantine)}")
+        with st.expander("Відхилені рядки"):
+            st.dataframe(quarantine, use_container_width=True, hide_index=True)
+    with st.expander("Використання пам'яті"):
+        st.dataframe(memory_report(base_df), use_container_width=True)
 else:
     st.warning("Будь ласка, завантажте файл Fishlog.txt для продовження")
     st.stop()
@@ -74,11 +108,23 @@ else:
 # Бічна панель для фільтрів
 with st.sidebar:
     st.header("Фільтри")
-    my_base = st.selectbox("База", ["Всі"] + sorted(base_df["base"].unique().tolist()), help="Виберіть базу або 'Всі'")
-    my_fish = st.selectbox("Риба", ["Всі"] + sorted(base_df["fish"].unique().tolist()), help="Виберіть рибу або 'Всі'")
-    my_location = st.selectbox("Локація", ["Всі"] + sorted(base_df["location"].unique().tolist()), help="Виберіть локацію або 'Всі'")
-    my_bait = st.selectbox("Наживка", ["Всі"] + sorted(base_df["bait"].unique().tolist()), help="Виберіть наживку або 'Всі'")
+    my_base = st.selectbox("База", ["Всі"] + sorted(base_df["base"].dropna().unique().tolist()), help="Виберіть базу або 'Всі'")
+    my_fish = st.selectbox("Риба", ["Всі"] + sorted(base_df["fish"].dropna().unique().tolist()), help="Виберіть рибу або 'Всі'")
+    my_location = st.selectbox("Локація", ["Всі"] + sorted(base_df["location"].dropna().unique().tolist()), help="Виберіть локацію або 'Всі'")
+    my_bait = st.selectbox("Наживка", ["Всі"] + sorted(base_df["bait"].dropna().unique().tolist()), help="Виберіть наживку або 'Всі'")
     my_weight = st.number_input("Мін. вага", value=0.0, step=1.0, help="Введіть мінімальну вагу")
+
+    # Правило трофея: квантилі беруться з ескізів, без сортування всіх уловів
+    trophy_rule = TROPHY_RULES[st.selectbox("Трофей (синій)", list(TROPHY_RULES), help="Вага, понад яку улов позначається синім")]
+    flags = None if trophy_rule is None else quantile_flags(base_df, *trophy_rule)
+
+    # Фільтр за джерелом і максимум виду для трофеїв — лише для кількох журналів
+    my_source = "Всі"
+    if SOURCE_COLUMN in base_df.columns:
+        my_source = st.selectbox("Джерело", ["Всі"] + sorted(base_df[SOURCE_COLUMN].dropna().unique().tolist()), help="Виберіть файл журналу або 'Всі'")
+        if trophy_rule is None:
+            trophy_scope = st.radio("Трофей відносно максимуму виду", ["усіх джерел", "свого джерела"], help="Синім позначаються улови від 80% максимуму виду")
+            flags = None if trophy_scope == "усіх джерел" else source_flags(base_df)
     
     # Перемикач для всіх типів наживок
     if 'select_all_bait_types' not in st.session_state:
@@ -89,16 +135,8 @@ with st.sidebar:
     # Спойлер для типів наживок
     with st.expander("Типи наживок"):
         bait_types = {
-            "Всі Біо": st.checkbox("Всі Біо", value=st.session_state.select_all_bait_types, help="Наживки без специфічних префіксів", key="bait_type_bio"),
-            "Вертушки": st.checkbox("Вертушки", value=st.session_state.select_all_bait_types, help="Наживки, що починаються з 'Circl'", key="bait_type_circl"),
-            "Девони": st.checkbox("Девони", value=st.session_state.select_all_bait_types, help="Наживки, що починаються з 'Devon'", key="bait_type_devon"),
-            "Мушки": st.checkbox("Мушки", value=st.session_state.select_all_bait_types, help="Наживки, що починаються з 'Musca'", key="bait_type_musca"),
-            "Пілкери": st.checkbox("Пілкери", value=st.session_state.select_all_bait_types, help="Наживки, що починаються з 'Pilk'", key="bait_type_pilk"),
-            "Попери": st.checkbox("Попери", value=st.session_state.select_all_bait_types, help="Наживки, що починаються з 'Pop'", key="bait_type_pop"),
-            "Твістери": st.checkbox("Твістери", value=st.session_state.select_all_bait_types, help="Наживки, що починаються з 'Tvis'", key="bait_type_tvis"),
-            "Вібро": st.checkbox("Вібро", value=st.session_state.select_all_bait_types, help="Наживки, що починаються з 'Vib'", key="bait_type_vib"),
-            "Воблери": st.checkbox("Воблери", value=st.session_state.select_all_bait_types, help="Наживки, що починаються з 'Vob'", key="bait_type_vob"),
-            "Спінери": st.checkbox("Спінери", value=st.session_state.select_all_bait_types, help="Наживки, що починаються з 'Spinner'", key="bait_type_spinner")
+            category.name: st.checkbox(category.name, value=st.session_state.select_all_bait_types, help=category.help, key=f"bait_type_{category.key}")
+            for category in BAIT_TAXONOMY.categories
         }
         
         # Оновлення стану перемикача на основі окремих чекбоксів
@@ -109,121 +147,147 @@ with st.sidebar:
     group_by = st.selectbox("Групувати за", ["Наживка", "Риба"], help="Виберіть, групувати за наживкою чи рибою")
     top_n_baits = st.number_input("Кількість наживок у графіку", value=10, min_value=1, step=1, help="Виберіть кількість наживок для відображення (топ-N за середньою вагою)")
 
+# Таблиця записів посторінково: перемикання сторінки перезапускає лише цей фрагмент
+@st.fragment
+def show_records(rows, flags=None):
+    col_size, col_page = st.columns(2)
+    page_size = col_size.selectbox("Записів на сторінці", PAGE_SIZES, index=1, key="record_page_size")
+    pages = page_count(len(rows), page_size)
+    if st.session_state.get("record_page", 1) > pages:
+        st.session_state.record_page = pages
+    page = col_page.number_input(f"Сторінка (з {pages})", min_value=1, max_value=pages, step=1, key="record_page")
+    with diag.stage("Стилізація записів", rows_in=len(rows)) as stage:
+        styled = record_page(base_df, rows, page, page_size, flags)
+        st.dataframe(styled, use_container_width=True, height=500)
+        stage.rows_out = len(styled.data)
+    # Перемикання сторінки перезапускає лише фрагмент, а панель діагностики вже показана —
+    # тож вимірювання цього етапу показуємо під таблицею
+    if diag.enabled:
+        measured = diag.stages[-1]
+        memory = "" if measured["peak_mb"] is None else f", пік пам'яті {measured['peak_mb']:.1f} МБ"
+        st.caption(f"{measured['stage']}: {measured['seconds']:.3f} с, рядків {measured['rows_out']}{memory}")
+
 # Кнопка оновлення в основній частині
 if st.button("Оновити"):
-    # Фільтрація
-    f = base_df.copy()
-    f = f[f['weight'] >= my_weight]
-    if my_base != 'Всі':
-        f = f[f['base'] == my_base]
-    if my_fish != 'Всі':
-        f = f[f['fish'] == my_fish]
-    if my_location != 'Всі':
-        f = f[f['location'] == my_location]
-    if my_bait != 'Всі':
-        f = f[f['bait'] == my_bait]
-    
     # Фільтрація за типами наживок
     selected_bait_types = [bait_type for bait_type, selected in bait_types.items() if selected]
     if not selected_bait_types:
         st.error("Виберіть хоча б один тип наживки")
         st.stop()
-    f = f[f['bait_type'].isin(selected_bait_types)]
+
+    # Фільтрація через індекс: рядки одразу впорядковані за спаданням ваги
+    query = dict(base=my_base, fish=my_fish, location=my_location, bait=my_bait, source=my_source,
+                 min_weight=my_weight, bait_types=selected_bait_types)
+    with diag.stage("Фільтрація", rows_in=len(base_df)) as stage:
+        rows = filter_index(base_df).query(**query)
+        stage.rows_out = len(rows)
+
+    # Зведення згортаються з куба; з рядків рахуються лише клітинки, які поріг ваги ділить
+    with diag.stage("Агрегація", rows_in=len(rows)) as stage:
+        agg = query_aggregates(base_df, rows, **query)
+        stage.rows_out = len(agg.groups["bait"]) + len(agg.groups["fish"])
 
     # Вивід результатів
-    if f.empty:
+    if len(rows) == 0:
         st.warning("Немає даних для заданих критеріїв")
     else:
         # Групування
         group_column = 'bait' if group_by == "Наживка" else 'fish'
-        grouped_base = f.groupby([group_column]).agg(
-            mean_weight=('weight', 'mean'),
-            max_weight=('weight', 'max'),
-            fish_count=('weight', 'size'),
-            min_depth=('depth', 'min'),
-            max_depth=('depth', 'max')
-        ).sort_values(by=group_column, ascending=True)
-
-        grouped_base['mean_weight'] = grouped_base['mean_weight'].astype(int)
-        grouped_base['max_weight'] = grouped_base['max_weight'].astype(int)
-        grouped_base['max_depth'] = grouped_base['max_depth'].astype(int)
-        grouped_base['min_depth'] = grouped_base['min_depth'].astype(int)
-
-        f_sorted = f.sort_values(by='weight', ascending=False)
+        with diag.stage("Зведена таблиця", rows_in=agg.count) as stage:
+            grouped_base = agg.summary(group_column)
+            stage.rows_out = len(grouped_base)
 
         # Вивід
         header = f'Зведення по базі {my_base if my_base != "Всі" else "всі бази"}, ' \
                  f'рибі {my_fish if my_fish != "Всі" else "всі риби"}, ' \
                  f'локації {my_location if my_location != "Всі" else "всі локації"}, ' \
-                 f'наживці {my_bait if my_bait != "Всі" else "всі наживки"}, ' \
-                 f'вага >= {my_weight}, типи наживок: {", ".join(selected_bait_types)}'
+                 f'наживці {my_bait if my_bait != "Всі" else "всі наживки"}, '
+        # Джерело згадується лише для даних з кількох журналів (як і його вибір у бічній панелі)
+        if SOURCE_COLUMN in base_df.columns:
+            header += f'джерелі {my_source if my_source != "Всі" else "всі джерела"}, '
+        header += f'вага >= {my_weight}, типи наживок: {", ".join(selected_bait_types)}'
         st.subheader(header)
-        st.write(f"Всього записів: {len(f_sorted)}")
+        st.write(f"Всього записів: {len(rows)}")
 
         # Зведена таблиця
         st.write("Зведена таблиця:")
         st.dataframe(grouped_base, use_container_width=True)
 
+        # Пороги трофеїв p90/p99 з ескізів: по виду загалом або на вибраній базі чи локації
+        with st.expander("Пороги трофеїв (p90/p99)"):
+            sketches = frame_sketches(base_df)
+            breakdown = "base" if my_base != "Всі" else "location" if my_location != "Всі" else "fish"
+            thresholds = sketches[breakdown].quantiles()
+            if breakdown != "fish":
+                selected = my_base if breakdown == "base" else my_location
+                thresholds = thresholds[thresholds.index.get_level_values(breakdown) == selected].droplevel(breakdown)
+            if my_fish != "Всі":
+                thresholds = thresholds[thresholds.index == my_fish]
+            st.dataframe(thresholds.rename(columns={"count": "fish_count"}), use_container_width=True)
+
         # Всі записи зі стилізацією
         st.write("Усі записи (відсортовані за вагою):")
-        
-        def style_row(row):
-            if row['id'] > 9999:
-                return ['color: red'] * len(row)
-            if row['fish'] in max_weights and row['weight'] > 0.8 * max_weights[row['fish']]:
-                return ['color: blue'] * len(row)
-            return [''] * len(row)
-
-        styled_df = f_sorted.style.apply(style_row, axis=1)
-        st.dataframe(styled_df, use_container_width=True, height=500)
+        st.session_state.record_page = 1
+        show_records(rows, flags)
 
         # Аналіз по годинах
         try:
-            f['hour'] = pd.to_datetime(f['time'], format='%H:%M').dt.hour
             st.subheader("Аналіз по годинах")
 
-            fish_count_per_hour = f.groupby('hour').size()
-            st.markdown("**Кількість риб по годинах:**")
-            st.bar_chart(fish_count_per_hour, x_label="Година", y_label="Кількість риб")
+            with diag.stage("Графіки по годинах", rows_in=agg.count) as stage:
+                fish_count_per_hour = agg.hourly_count()
+                st.markdown("**Кількість риб по годинах:**")
+                st.bar_chart(fish_count_per_hour, x_label="Година", y_label="Кількість риб")
 
-            sum_weight_per_hour = f.groupby('hour')['weight'].sum()
-            st.markdown("**Сумарна вага по годинах:**")
-            st.bar_chart(sum_weight_per_hour, x_label="Година", y_label="Сумарна вага (г)")
+                sum_weight_per_hour = agg.hourly_weight()
+                st.markdown("**Сумарна вага по годинах:**")
+                st.bar_chart(sum_weight_per_hour, x_label="Година", y_label="Сумарна вага (г)")
+                stage.rows_out = len(fish_count_per_hour)
         except Exception as e:
             st.warning(f"Не вдалося виконати аналіз по годинах: {str(e)}")
 
         # Гістограма глибини лову
         st.subheader("Аналіз глибини вилову")
         try:
-            bins = [0, 20, 250, 500, 1000, np.inf]
-            labels = ['0-20', '21-250', '251-500', '501-1000', '1001+']
-            f['depth_bin'] = pd.cut(f['depth'], bins=bins, labels=labels, right=False)
-
-            depth_hist = f['depth_bin'].value_counts().reindex(labels, fill_value=0)
-            st.markdown("**Розподіл кількості виловів по фіксованих діапазонах глибини (м):**")
-            st.bar_chart(depth_hist, x_label="Діапазон глибини (м)", y_label="Кількість виловів")
+            with diag.stage("Гістограма глибини", rows_in=agg.count) as stage:
+                depth_hist = agg.depth_hist()
+                st.markdown("**Розподіл кількості виловів по фіксованих діапазонах глибини (м):**")
+                st.bar_chart(depth_hist, x_label="Діапазон глибини (м)", y_label="Кількість виловів")
+                stage.rows_out = len(depth_hist)
         except Exception as e:
             st.warning(f"Не вдалося побудувати гістограму глибини: {str(e)}")
 
         # Графік залежності ваги риби від наживки
         st.subheader("Аналіз ваги риби за наживкою")
         try:
-            bait_stats = f.groupby('bait').agg(
-                mean_weight=('weight', 'mean'),
-                fish_count=('fish', 'count')
-            ).reset_index()
-            bait_stats = bait_stats.sort_values(by='mean_weight', ascending=False).head(top_n_baits)
-            fig = px.bar(
-                bait_stats,
-                y='bait',
-                x='mean_weight',
-                title=f"Середня вага риби для топ-{top_n_baits} наживок (кількість риб у підписах)",
-                labels={'bait': 'Наживка', 'mean_weight': 'Середня вага (г)'},
-                orientation='h',
-                text=bait_stats['fish_count'].apply(lambda x: f"{x} риб")
-            )
-            fig.update_traces(textposition='auto')
-            fig.update_layout(height=200 + top_n_baits * 30, showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
+            with diag.stage("Графік топ наживок", rows_in=len(agg.groups["bait"])) as stage:
+                bait_stats = agg.top_baits(top_n_baits)
+                fig = px.bar(
+                    bait_stats,
+                    y='bait',
+                    x='mean_weight',
+                    title=f"Середня вага риби для топ-{top_n_baits} наживок (кількість риб у підписах)",
+                    labels={'bait': 'Наживка', 'mean_weight': 'Середня вага (г)'},
+                    orientation='h',
+                    text=bait_stats['fish_count'].apply(lambda x: f"{x} риб")
+                )
+                fig.update_traces(textposition='auto')
+                fig.update_layout(height=200 + top_n_baits * 30, showlegend=False)
+                st.plotly_chart(fig, use_container_width=True)
+                stage.rows_out = len(bait_stats)
         except Exception as e:
             st.warning(f"Не вдалося побудувати графік ваги за наживкою: {str(e)}")
+
+# Панель діагностики: етапи цього запуску, стан кешу запитів і експорт у JSON
+if diag.enabled:
+    with st.expander("Діагностика"):
+        st.dataframe(diag.frame(), use_container_width=True, hide_index=True)
+        cache_stats = filter_index(base_df).cache.stats()
+        st.write(f"Кеш запитів: влучань {cache_stats['hits']}, з ширшого запиту {cache_stats['subsumed']}, "
+                 f"промахів {cache_stats['misses']}, записів {cache_stats['entries']} "
+                 f"({cache_stats['bytes'] / 2**20:.1f} МБ)")
+        st.caption("Пам'ять рахується для всього процесу: якщо одночасно працюють інші сесії, цифри орієнтовні, "
+                   "а для етапів, що перетнулися з вимірюванням в іншій сесії, не показуються. "
+                   "Стилізація записів при перемиканні сторінки сюди не потрапляє — її вимірювання під таблицею записів")
+        st.download_button("Експорт у JSON", diag.to_json(rows=len(base_df), query_cache=cache_stats),
+                           file_name="fishlog-diagnostics.json", mime="application/json")
@@ -0,0 +1,34 @@
+from fishlog.aggregate import DEPTH_LABELS, Aggregates
+from fishlog.backend import BACKENDS, MemoryBackend, open_backend
+from fishlog.baits import BAIT_TAXONOMY, BaitTaxonomy, load_taxonomy
+from fishlog.cube import Cube, frame_cube, query_aggregates
+from fishlog.diagnostics import Diagnostics
+from fishlog.index import ALL, FilterIndex, QueryCache, filter_index, normalize_query
+from fishlog.ingest import IngestJob, ingest_fishlog_bytes, ingest_fishlog_files
+from fishlog.loader import (
+    COLUMN_NAMES,
+    FishlogFollower,
+    clear_cache,
+    follow_fishlog,
+    load_fishlog,
+    load_fishlog_bytes,
+    parse_fishlog,
+    parse_fishlog_bytes,
+    quarantine_of,
+)
+from fishlog.records import (
+    FLAG_STYLES,
+    PAGE_SIZES,
+    frame_flags,
+    page_count,
+    quantile_flags,
+    record_flags,
+    record_page,
+    source_flags,
+    species_max_weights,
+    take_page,
+    threshold_flags,
+)
+from fishlog.schema import SCHEMA, SOURCE_COLUMN, apply_schema, format_time, hour_of, memory_report
+from fishlog.sketch import SketchSet, WeightSketch, frame_sketches
+from fishlog.sources import dedupe_sources, load_sources, resolve_sources
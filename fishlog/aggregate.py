@@ -0,0 +1,174 @@
+import numpy as np
+import pandas as pd
+
+from fishlog.schema import hour_of
+
+# Фіксовані діапазони глибини (ліва межа включно)
+DEPTH_BINS = [0, 20, 250, 500, 1000, np.inf]
+DEPTH_LABELS = ["0-20", "21-250", "251-500", "501-1000", "1001+"]
+# Стовпці, за якими будується зведена таблиця ("Групувати за")
+GROUP_COLUMNS = ["bait", "fish"]
+MEASURES = ["count", "weight_sum", "weight_min", "weight_max", "depth_sum", "depth_min", "depth_max"]
+# Як поєднуються міри двох частин даних
+MEASURE_MERGE = {"count": "sum", "weight_sum": "sum", "depth_sum": "sum",
+                 "weight_min": "min", "depth_min": "min", "weight_max": "max", "depth_max": "max"}
+HOURS = 24
+
+
+def depth_bin_codes(depth):
+    # Номер діапазону глибини; -1 для від'ємної глибини (як NaN у pd.cut)
+    return (np.searchsorted(DEPTH_BINS, np.asarray(depth), side="right") - 1).astype(np.int8)
+
+
+def row_measures(weight, depth):
+    # Кожен рядок — клітинка з однієї риби
+    weight = np.asarray(weight, dtype=np.int64)
+    depth = np.asarray(depth, dtype=np.int64)
+    return {
+        "count": np.ones(len(weight), dtype=np.int64),
+        "weight_sum": weight, "weight_min": weight, "weight_max": weight,
+        "depth_sum": depth, "depth_min": depth, "depth_max": depth,
+    }
+
+
+def reduce_groups(codes, size, measures):
+    # Згортає міри за цілими кодами груп 0..size-1: суми через bincount, мін./макс. через ufunc.at
+    result = {}
+    for name in ("count", "weight_sum", "depth_sum"):
+        result[name] = np.bincount(codes, weights=measures[name], minlength=size).astype(np.int64)
+    for name in ("weight_min", "depth_min"):
+        result[name] = np.full(size, np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(result[name], codes, measures[name])
+    for name in ("weight_max", "depth_max"):
+        result[name] = np.full(size, np.iinfo(np.int64).min, dtype=np.int64)
+        np.maximum.at(result[name], codes, measures[name])
+    return result
+
+
+def build_cells(dims, sizes, measures, return_codes=False):
+    # Один прохід по рядках: усі виміри зводяться в один складений ключ, ключ факторизується,
+    # і міри згортаються за отриманими кодами. Код -1 (порожнє значення) зберігається як -1.
+    # return_codes=True — також номер клітинки кожного рядка
+    names = list(dims)
+    shape = [sizes[name] + 1 for name in names]
+    key = np.ravel_multi_index([np.asarray(dims[name], dtype=np.int64) + 1 for name in names], shape)
+    codes, uniques = pd.factorize(key)
+    cells = {name: values - 1 for name, values in zip(names, np.unravel_index(uniques, shape))}
+    cells.update(reduce_groups(codes, len(uniques), measures))
+    if return_codes:
+        return pd.DataFrame(cells), codes.astype(np.int32)
+    return pd.DataFrame(cells)
+
+
+class Aggregates:
+    # Результат агрегації після фільтрації: з нього читають усі таблиці та графіки.
+    # groups — міри по наживці та рибі, hourly — кількість і вага по годинах,
+    # depth — кількість виловів по діапазонах глибини
+    def __init__(self, groups, hourly, depth):
+        self.groups = groups
+        self.hourly = hourly.set_axis(pd.Index(hourly.index.astype(np.int64), name="hour"))
+        self.depth = depth
+
+    @property
+    def count(self):
+        return int(self.hourly["count"].sum())
+
+    def merge(self, other):
+        # Агрегати двох частин даних (напр. фрагментів файлу) без повторного перегляду рядків
+        groups = {}
+        for column in GROUP_COLUMNS:
+            merged = pd.concat([self.groups[column], other.groups[column]]).groupby(level=0).agg(MEASURE_MERGE)
+            groups[column] = merged[MEASURES].rename_axis(column)
+        hourly = self.hourly.add(other.hourly, fill_value=0).astype(np.int64)
+        return Aggregates(groups, hourly, self.depth.add(other.depth, fill_value=0).astype(np.int64))
+
+    def summary(self, group_column):
+        g = self.groups[group_column]
+        result = pd.DataFrame({
+            "mean_weight": (g["weight_sum"] / g["count"]).astype(int),
+            "max_weight": g["weight_max"].astype(int),
+            "fish_count": g["count"].astype(int),
+            "min_depth": g["depth_min"].astype(int),
+            "max_depth": g["depth_max"].astype(int),
+        })
+        result.index.name = group_column
+        return result.sort_index()
+
+    def hourly_count(self):
+        return self.hourly["count"]
+
+    def hourly_weight(self):
+        return self.hourly["weight_sum"]
+
+    def depth_hist(self):
+        return self.depth
+
+    def top_baits(self, top_n):
+        g = self.groups["bait"]
+        stats = pd.DataFrame({
+            "bait": g.index.astype(str),
+            "mean_weight": (g["weight_sum"] / g["count"]).to_numpy(),
+            "fish_count": g["count"].to_numpy(),
+        })
+        return stats.sort_values(by="mean_weight", ascending=False).head(top_n)
+
+    def to_dict(self):
+        # Звичайні списки й словники (для JSON); from_dict відновлює той самий об'єкт
+        return {
+            "groups": {column: {"index": g.index.tolist(), "data": g[MEASURES].to_numpy().tolist()}
+                       for column, g in self.groups.items()},
+            "hourly": {"index": self.hourly.index.tolist(), "count": self.hourly["count"].tolist(),
+                       "weight_sum": self.hourly["weight_sum"].tolist()},
+            "depth": self.depth.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        groups = {column: pd.DataFrame(np.asarray(g["data"], dtype=np.int64).reshape(-1, len(MEASURES)), columns=MEASURES,
+                                       index=pd.Index(g["index"], dtype=object, name=column))
+                  for column, g in data["groups"].items()}
+        hourly = pd.DataFrame({"count": np.asarray(data["hourly"]["count"], dtype=np.int64),
+                               "weight_sum": np.asarray(data["hourly"]["weight_sum"], dtype=np.int64)},
+                              index=np.asarray(data["hourly"]["index"], dtype=np.int64))
+        depth = pd.Series(np.asarray(data["depth"], dtype=np.int64), index=DEPTH_LABELS, name="count")
+        return cls(groups, hourly, depth)
+
+    @classmethod
+    def from_cells(cls, cells, categories):
+        # Усі панелі згортаються з клітинок (куба або щойно відфільтрованих рядків)
+        measures = {name: cells[name].to_numpy() for name in MEASURES}
+        groups = {}
+        for column in GROUP_COLUMNS:
+            codes = cells[column].to_numpy()
+            valid = codes >= 0
+            reduced = reduce_groups(codes[valid], len(categories[column]),
+                                    {name: values[valid] for name, values in measures.items()})
+            present = reduced["count"] > 0
+            groups[column] = pd.DataFrame({name: values[present] for name, values in reduced.items()},
+                                          index=pd.Index(np.asarray(categories[column], dtype=object)[present], name=column))
+        hours = cells["hour"].to_numpy()
+        count = np.bincount(hours, weights=measures["count"], minlength=HOURS).astype(np.int64)
+        weight_sum = np.bincount(hours, weights=measures["weight_sum"], minlength=HOURS).astype(np.int64)
+        present = count > 0
+        hourly = pd.DataFrame({"count": count[present], "weight_sum": weight_sum[present]},
+                              index=np.flatnonzero(present))
+        bins = cells["depth_bin"].to_numpy()
+        valid = bins >= 0
+        depth = pd.Series(np.bincount(bins[valid], weights=measures["count"][valid], minlength=len(DEPTH_LABELS)).astype(np.int64),
+                          index=DEPTH_LABELS, name="count")
+        return cls(groups, hourly, depth)
+
+    @classmethod
+    def from_rows(cls, f):
+        # Єдиний прохід по відфільтрованих рядках замість окремого groupby для кожної панелі
+        dims = {
+            "bait": f["bait"].cat.codes.to_numpy(),
+            "fish": f["fish"].cat.codes.to_numpy(),
+            "hour": hour_of(f["time"].to_numpy()),
+            "depth_bin": depth_bin_codes(f["depth"]),
+        }
+        categories = {column: f[column].cat.categories for column in GROUP_COLUMNS}
+        sizes = {column: len(values) for column, values in categories.items()}
+        sizes.update(hour=HOURS, depth_bin=len(DEPTH_LABELS))
+        cells = build_cells(dims, sizes, row_measures(f["weight"], f["depth"]))
+        return cls.from_cells(cells, categories)
@@ -0,0 +1,170 @@
+import codecs
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
+from fishlog.baits import BAIT_TAXONOMY
+from fishlog.schema import COLUMN_NAMES, SCHEMA, apply_schema, empty_frame, fits_dtype, time_to_minutes
+
+# Явна схема для багатопотокового CSV-читача pyarrow: текстові виміри одразу словникові,
+# числа читаються як текст і перевіряються окремо, щоб погані значення не зупиняли розбір
+ARROW_SCHEMA = {
+    "fish": pa.dictionary(pa.int32(), pa.string()),
+    "weight": pa.string(),
+    "bait": pa.dictionary(pa.int32(), pa.string()),
+    "base": pa.dictionary(pa.int32(), pa.string()),
+    "location": pa.dictionary(pa.int32(), pa.string()),
+    "id": pa.string(),
+    "time": pa.dictionary(pa.int32(), pa.string()),
+    "depth": pa.string(),
+}
+NUMERIC_COLUMNS = ["weight", "id", "depth"]
+_NUMBER_PATTERN = r"^[+-]?(\d+(\.\d*)?|\.\d+)$"
+
+
+def empty_quarantine():
+    return pd.DataFrame({"line": pd.Series(dtype=np.int64), "reason": pd.Series(dtype=object),
+                         "text": pd.Series(dtype=object)})
+
+
+def _line_bounds(arr):
+    # Початок і кінець (без \n) кожного рядка буфера
+    ends = np.flatnonzero(arr == ord("\n"))
+    if len(arr) and arr[-1] != ord("\n"):
+        ends = np.append(ends, len(arr))
+    starts = np.concatenate([[0], ends[:-1] + 1]).astype(np.int64)
+    return starts, ends
+
+
+def _undecodable_lines(data, ends):
+    # Рядки з байтами, що не є UTF-8: pyarrow не може прочитати такий буфер узагалі.
+    # Декодер зупиняється на першій помилці — відмічаємо її рядок і продовжуємо з наступного
+    lines = []
+    view = memoryview(data)
+    position = 0
+    while position < len(data):
+        try:
+            codecs.utf_8_decode(view[position:], "strict", True)
+            break
+        except UnicodeDecodeError as e:
+            line = int(np.searchsorted(ends, position + e.start))
+            lines.append(line)
+            position = int(ends[line]) + 1
+    return np.array(lines, dtype=np.int64)
+
+
+def _blank_lines(arr, starts, ends, lines):
+    # Копія буфера, де вміст вказаних рядків замінено пробілами: номери рядків не змінюються,
+    # а рядок з одного поля pyarrow пропускає (invalid_row_handler)
+    arr = arr.copy()
+    for line in lines:
+        arr[starts[line]:ends[line]] = ord(" ")
+    return arr.tobytes()
+
+
+def _read_table(data):
+    return pa_csv.read_csv(
+        pa.py_buffer(data),
+        read_options=pa_csv.ReadOptions(column_names=COLUMN_NAMES, use_threads=True),
+        parse_options=pa_csv.ParseOptions(delimiter=":", quote_char=False,
+                                          invalid_row_handler=lambda row: "skip"),
+        convert_options=pa_csv.ConvertOptions(column_types=ARROW_SCHEMA, strings_can_be_null=True),
+    ).unify_dictionaries()
+
+
+def _numeric(column):
+    text = pc.utf8_trim_whitespace(column)
+    valid = pc.fill_null(pc.match_substring_regex(text, _NUMBER_PATTERN), False)
+    values = pc.cast(pc.if_else(valid, text, "0"), pa.float64())
+    return values.to_numpy(zero_copy_only=False), valid.to_numpy(zero_copy_only=False)
+
+
+def parse_fishlog_arrow(data, taxonomy=BAIT_TAXONOMY, first_line=1):
+    # Розбирає байти журналу. Повертає (df, quarantine): відхилені рядки не зникають,
+    # а потрапляють у quarantine з номером рядка файлу, причиною та текстом
+    arr = np.frombuffer(data, dtype=np.uint8)
+    starts, ends = _line_bounds(arr)
+    # Кількість полів рядка визначаємо за кількістю ":" — так відомо, який рядок файлу
+    # відповідає кожному рядку таблиці, навіть коли pyarrow читає блоки в кількох потоках
+    colons = np.bincount(np.searchsorted(ends, np.flatnonzero(arr == ord(":"))), minlength=len(ends))
+    lengths = ends - starts
+    has_cr = lengths > 0
+    has_cr[has_cr] = arr[ends[has_cr] - 1] == ord("\r")
+    blank = (lengths - has_cr) == 0
+    structural = (colons == len(COLUMN_NAMES) - 1) & ~blank
+    undecodable = np.zeros(len(ends), dtype=bool)
+    split = np.zeros(len(ends), dtype=bool)
+
+    # Рядки з іншою кількістю полів pyarrow декодує для invalid_row_handler, тож ті з них,
+    # що не в UTF-8, шукаємо одразу (таких рядків мало)
+    for line in np.flatnonzero(~structural & ~blank):
+        try:
+            bytes(arr[starts[line]:ends[line]]).decode("utf-8")
+        except UnicodeDecodeError:
+            undecodable[line] = True
+
+    table = None
+    if structural.any():
+        # Зазвичай буфер читається з першої спроби. Якщо pyarrow відмовився (байти не в UTF-8)
+        # або рядків таблиці не стільки, скільки структурних рядків файлу (окремий \r pyarrow
+        # вважає кінцем рядка), шукаємо такі рядки, затираємо їх у копії буфера і читаємо ще раз
+        if not undecodable.any():
+            try:
+                table = _read_table(data)
+            except pa.ArrowInvalid:
+                pass
+        if table is None or table.num_rows != np.count_nonzero(structural):
+            undecodable[_undecodable_lines(data, ends)] = True
+            returns = np.bincount(np.searchsorted(ends, np.flatnonzero(arr == ord("\r"))), minlength=len(ends))
+            split = returns > has_cr
+            structural &= ~undecodable & ~split
+            problems = np.flatnonzero(undecodable | split)
+            table = _read_table(_blank_lines(arr, starts, ends, problems)) if structural.any() else None
+    table_lines = np.flatnonzero(structural)
+
+    rejected = [(np.flatnonzero(undecodable), "encoding"),
+                (np.flatnonzero(~structural & ~blank & ~undecodable), "columns")]
+    if table is not None:
+        if table.num_rows != len(table_lines):
+            raise ValueError("Не вдалося зіставити рядки таблиці з рядками файлу")
+        df = pd.DataFrame({column: table.column(column).to_pandas() for column in ("fish", "bait", "base", "location")})
+        bad = np.zeros(len(df), dtype=bool)
+        for column in NUMERIC_COLUMNS:
+            values, valid = _numeric(table.column(column))
+            # Дробові значення і значення поза діапазоном типу зі SCHEMA теж відхиляються —
+            # інакше компактна схема мовчки їх спотворила б
+            valid = valid & fits_dtype(values, SCHEMA[column])
+            df[column] = values
+            rejected.append((table_lines[~valid & ~bad], column))
+            bad |= ~valid
+        df["time"] = time_to_minutes(table.column("time").to_pandas()).to_numpy()
+        valid = df["time"].notna().to_numpy()
+        rejected.append((table_lines[~valid & ~bad], "time"))
+        bad |= ~valid
+        df["bait_type"] = taxonomy.classify(df["bait"])
+        valid = df["bait_type"].notna().to_numpy()
+        rejected.append((table_lines[~valid & ~bad], "bait"))
+        bad |= ~valid
+        df = apply_schema(df[~bad][list(empty_frame().columns)].reset_index(drop=True))
+    else:
+        df = empty_frame()
+
+    lines = np.concatenate([positions for positions, _ in rejected]).astype(np.int64)
+    if not len(lines):
+        return df, empty_quarantine()
+    reasons = np.concatenate([[reason] * len(positions) for positions, reason in rejected])
+    order = np.argsort(lines, kind="stable")
+    lines, reasons = lines[order], reasons[order]
+    texts = [bytes(arr[starts[line]:ends[line]]).rstrip(b"\r").decode("utf-8", "replace") for line in lines]
+    quarantine = pd.DataFrame({"line": lines + first_line, "reason": reasons, "text": texts})
+    return df, quarantine
+
+
+def concat_quarantine(frames):
+    frames = [frame for frame in frames if len(frame)]
+    if not frames:
+        return empty_quarantine()
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,67 @@
+import os
+import threading
+
+from fishlog.cube import query_aggregates
+from fishlog.index import filter_index
+from fishlog.loader import follow_fishlog, quarantine_of
+from fishlog.records import take_page
+from fishlog.sources import load_sources
+
+# Де лежать дані для аналізу: memory — DataFrame у пам'яті, sqlite/duckdb — база на диску
+# для журналів, більших за пам'ять, http — запущена служба запитів (python -m fishlog.service,
+# адреса в FISHLOG_SERVICE). Вибирається змінною середовища FISHLOG_BACKEND
+BACKENDS = ["memory", "sqlite", "duckdb", "http"]
+DEFAULT_BACKEND = "memory"
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+class MemoryBackend:
+    # Запити до DataFrame в пам'яті через індекс фільтрів і куб
+    def __init__(self, df):
+        self.df = df
+
+    @property
+    def columns(self):
+        return list(self.df.columns)
+
+    def values(self, column):
+        return sorted(self.df[column].dropna().unique().tolist())
+
+    def quarantine(self):
+        return quarantine_of(self.df)
+
+    def count(self, **query):
+        return len(filter_index(self.df).query(**query))
+
+    def aggregates(self, **query):
+        # Зведення згортаються з куба; з рядків рахуються лише клітинки, які поріг ваги ділить
+        return query_aggregates(self.df, filter_index(self.df).query(**query), **query)
+
+    def records(self, page, page_size, **query):
+        return take_page(self.df, filter_index(self.df).query(**query), page, page_size)
+
+
+def open_backend(spec, kind=None, database=None):
+    # Файл, каталог або glob-шаблон журналів -> бекенд з однаковими методами запитів.
+    # Один файл у пам'яті читається в режимі стеження (дочитуються лише нові рядки)
+    kind = kind or os.environ.get("FISHLOG_BACKEND", DEFAULT_BACKEND)
+    if kind not in BACKENDS:
+        raise ValueError(f"Невідомий бекенд {kind!r}; можливі: {', '.join(BACKENDS)}")
+    if kind == "memory":
+        return MemoryBackend(follow_fishlog(spec).df if os.path.isfile(spec) else load_sources(spec))
+    if kind == "http":
+        # Дані завантажила служба; spec тут не потрібен
+        from fishlog.service import ServiceBackend
+
+        return ServiceBackend()
+    from fishlog.sqlstore import DIALECTS, SqlBackend
+
+    key = (kind, spec, database)
+    with _backends_lock:
+        backend = _backends.get(key)
+        if backend is None:
+            backend = _backends[key] = SqlBackend(spec, DIALECTS[kind], database)
+    backend.sync()
+    return backend
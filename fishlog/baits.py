@@ -0,0 +1,56 @@
+import hashlib
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Таблиця префіксів за замовчуванням; FISHLOG_BAIT_TYPES може вказати інший файл
+DEFAULT_TAXONOMY_PATH = os.path.join(os.path.dirname(__file__), "bait_types.json")
+
+BaitCategory = namedtuple("BaitCategory", ["name", "key", "prefix", "help"])
+
+
+class BaitTaxonomy:
+    # Тип наживки визначається за першим збіглим префіксом; без збігу — категорія за замовчуванням
+    def __init__(self, config):
+        default = config["default"]
+        self.default = BaitCategory(default["name"], default["key"], None, default["help"])
+        self.prefixed = [
+            BaitCategory(item["name"], item["key"], item["prefix"],
+                         item.get("help", f"Наживки, що починаються з '{item['prefix']}'"))
+            for item in config["prefixes"]
+        ]
+        # Порядок категорій такий самий, як у чекбоксах бічної панелі
+        self.categories = [self.default] + self.prefixed
+        self.names = [category.name for category in self.categories]
+        self.fingerprint = hashlib.sha1(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def classify_one(self, bait):
+        if pd.isna(bait):
+            return None
+        bait = str(bait).strip()
+        for category in self.prefixed:
+            if bait.startswith(category.prefix):
+                return category.name
+        return self.default.name
+
+    def classify(self, baits):
+        # Класифікуємо лише унікальні наживки (їх кілька сотень), а рядкам
+        # роздаємо результат через коди категорій
+        codes, uniques = pd.factorize(baits)
+        position = {name: i for i, name in enumerate(self.names)}
+        lookup = np.array([position[self.classify_one(bait)] for bait in uniques] + [-1], dtype=np.int8)
+        # Код -1 (порожня наживка) бере останній елемент lookup, тобто теж -1
+        return pd.Series(pd.Categorical.from_codes(lookup[codes], categories=self.names),
+                         index=baits.index, name="bait_type")
+
+
+def load_taxonomy(path=None):
+    path = path or os.environ.get("FISHLOG_BAIT_TYPES") or DEFAULT_TAXONOMY_PATH
+    with open(path, encoding="utf-8") as fh:
+        return BaitTaxonomy(json.load(fh))
+
+
+BAIT_TAXONOMY = load_taxonomy()
@@ -0,0 +1,228 @@
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+from fishlog.aggregate import Aggregates
+from fishlog.baits import BAIT_TAXONOMY
+from fishlog.cube import Cube
+from fishlog.index import FilterIndex
+from fishlog.loader import parse_fishlog_bytes
+from fishlog.records import record_flags, record_page, species_max_weights
+from fishlog.schema import COLUMN_NAMES, time_to_minutes
+from fishlog.synthetic import write_fishlog
+
+try:
+    import resource
+except ImportError:  # Windows: пік RSS процесу недоступний
+    resource = None
+
+# Розміри журналів за замовчуванням (рядків); генератор тягне і 50 млн
+DEFAULT_LINES = [10_000, 100_000, 1_000_000]
+DEFAULT_BASELINE = "bench_baseline.json"
+DATA_DIR = os.path.join(tempfile.gettempdir(), "fishlog-bench")
+# Етап вважається повільнішим за базовий, якщо rows/sec упав більше ніж на цю частку
+REGRESSION_SHARE = 0.2
+# Частка зіпсованих рядків у синтетичних журналах (щоб працював і карантин)
+BAD_SHARE = 0.001
+# Запити фільтрації: типові комбінації бічної панелі
+QUERY_COUNT = 20
+RECORDS_PAGE_SIZE = 100
+
+
+def stage(results, name, rows, run, memory=True):
+    # Час етапу міряється без tracemalloc: трасування сповільнює кожну алокацію в рази.
+    # Пік пам'яті Python/numpy (tracemalloc) і приріст пам'яті pyarrow — окремим повторним проходом
+    started = time.perf_counter()
+    value = run()
+    seconds = time.perf_counter() - started
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        arrow_before = pa.total_allocated_bytes()
+        try:
+            traced = run()
+            arrow = max(pa.total_allocated_bytes() - arrow_before, 0)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        del traced
+        peak_mb = round((peak + arrow) / 2**20, 2)
+    results[name] = {
+        "seconds": round(seconds, 6),
+        "rows": rows,
+        "rows_per_sec": round(rows / seconds) if seconds else None,
+        "peak_mb": peak_mb,
+    }
+    return value
+
+
+def synthetic_path(lines, seed=0, data_dir=DATA_DIR):
+    # Згенерований журнал кешується на диску: повторні прогони не генерують його заново
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"fishlog-{lines}-{seed}.txt")
+    if not os.path.exists(path):
+        write_fishlog(path, lines, seed=seed, bad_share=BAD_SHARE)
+    return path
+
+
+def sample_queries(df, count, seed=0):
+    rng = np.random.default_rng(seed)
+    queries = []
+    for _ in range(count):
+        query = {"min_weight": float(rng.choice([0, 100, 500, 2000]))}
+        for column in ("base", "fish", "location"):
+            if rng.random() < 0.5:
+                query[column] = rng.choice(df[column].cat.categories)
+        if rng.random() < 0.3:
+            query["bait_types"] = list(rng.choice(BAIT_TAXONOMY.names, 4, replace=False))
+        queries.append(query)
+    return queries
+
+
+def _filter(index, queries):
+    selections = []
+    for query in queries:
+        index.cache.clear()
+        selections.append(index.query(**query))
+    return selections
+
+
+def _group(df, cube, queries):
+    aggregates = Aggregates.from_rows(df)
+    for query in queries:
+        cube.rollup(**query)
+    return aggregates
+
+
+def _style(df, selections, flags):
+    for selection in selections:
+        record_page(df, selection, 1, RECORDS_PAGE_SIZE, flags).to_html()
+
+
+def _chart(aggregates):
+    import plotly.express as px
+
+    aggregates.hourly_count()
+    aggregates.hourly_weight()
+    aggregates.depth_hist()
+    bait_stats = aggregates.top_baits(10)
+    return px.bar(bait_stats, y="bait", x="mean_weight", orientation="h",
+                  text=bait_stats["fish_count"].apply(lambda x: f"{x} риб"))
+
+
+def run_pipeline(path, memory=True):
+    # Етапи конвеєра застосунків окремо: повний розбір, а також перетворення часу і
+    # класифікація наживок на сирих стовпцях, далі індекс, фільтри, групування, стилізація і графіки.
+    # З memory=False пік пам'яті не міряється (без повторного проходу кожного етапу)
+    import plotly.express as px
+
+    # Перший виклик plotly завантажує шаблони — це не вартість побудови графіка
+    px.bar(x=[0], y=[0])
+    results = {}
+    with open(path, "rb") as fh:
+        data = fh.read()
+    lines = data.count(b"\n")
+    df, quarantine = stage(results, "parse", lines, lambda: parse_fishlog_bytes(data), memory)
+    rows = len(df)
+
+    raw = pa_csv.read_csv(
+        pa.py_buffer(data),
+        read_options=pa_csv.ReadOptions(column_names=COLUMN_NAMES),
+        parse_options=pa_csv.ParseOptions(delimiter=":", quote_char=False, invalid_row_handler=lambda row: "skip"),
+        convert_options=pa_csv.ConvertOptions(column_types={column: pa.dictionary(pa.int32(), pa.string())
+                                                            for column in ("bait", "time")},
+                                              include_columns=["bait", "time"]),
+    )
+    raw_time = raw.column("time").to_pandas()
+    raw_bait = raw.column("bait").to_pandas()
+    del raw, data
+    stage(results, "time_conversion", len(raw_time), lambda: time_to_minutes(raw_time), memory)
+    stage(results, "classification", len(raw_bait), lambda: BAIT_TAXONOMY.classify(raw_bait), memory)
+    del raw_time, raw_bait
+
+    index = stage(results, "index_build", rows, lambda: FilterIndex(df), memory)
+    cube = stage(results, "cube_build", rows, lambda: Cube(df), memory)
+    queries = sample_queries(df, QUERY_COUNT)
+    selections = stage(results, "filtering", rows * len(queries), lambda: _filter(index, queries), memory)
+    aggregates = stage(results, "grouping", rows, lambda: _group(df, cube, queries), memory)
+    # Позначки рахуються по всьому кадру, а стилізуються лише видимі сторінки —
+    # тож і rows/sec стилізації рахується від реально стилізованих рядків
+    flags = stage(results, "flags", rows, lambda: record_flags(df, species_max_weights(df)), memory)
+    styled = sum(min(len(selection), RECORDS_PAGE_SIZE) for selection in selections)
+    stage(results, "styling", styled, lambda: _style(df, selections, flags), memory)
+    stage(results, "chart_prep", rows, lambda: _chart(aggregates), memory)
+    return {"lines": lines, "rows": rows, "rejected": len(quarantine), "stages": results}
+
+
+def compare(current, baseline, share=REGRESSION_SHARE):
+    # Етапи, де rows/sec упав більше ніж на share відносно базового прогону
+    regressions = []
+    for size, run in current["runs"].items():
+        base_run = baseline.get("runs", {}).get(size)
+        if base_run is None:
+            continue
+        for name, result in run["stages"].items():
+            base = base_run["stages"].get(name)
+            if not base or not base["rows_per_sec"] or not result["rows_per_sec"]:
+                continue
+            ratio = result["rows_per_sec"] / base["rows_per_sec"]
+            if ratio < 1 - share:
+                regressions.append((size, name, ratio))
+    return regressions
+
+
+def format_report(report):
+    lines = []
+    for size, run in report["runs"].items():
+        lines.append(f"{size} рядків (розібрано {run['rows']}, відхилено {run['rejected']}), "
+                     f"пік RSS {report['max_rss_mb']} МБ")
+        lines.append(f"  {'етап':<16}{'сек':>10}{'рядків/с':>14}{'пік МБ':>10}")
+        for name, result in run["stages"].items():
+            peak = "—" if result["peak_mb"] is None else f"{result['peak_mb']:.1f}"
+            lines.append(f"  {name:<16}{result['seconds']:>10.3f}{result['rows_per_sec'] or 0:>14,}{peak:>10}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк конвеєра Fishlog на синтетичних журналах")
+    parser.add_argument("--lines", type=int, nargs="+", default=DEFAULT_LINES, help="розміри журналів, рядків")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=DATA_DIR, help="де зберігати згенеровані журнали")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="файл базового прогону")
+    parser.add_argument("--save-baseline", action="store_true", help="зберегти цей прогін як базовий")
+    parser.add_argument("--json", help="записати звіт у JSON-файл")
+    parser.add_argument("--no-memory", action="store_true", help="не міряти пік пам'яті (без повторних проходів)")
+    args = parser.parse_args(argv)
+
+    report = {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count(), "runs": {}}
+    for lines in args.lines:
+        report["runs"][str(lines)] = run_pipeline(synthetic_path(lines, args.seed, args.data_dir), not args.no_memory)
+    report["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1) if resource else None
+    print(format_report(report))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+        print(f"Базовий прогін збережено: {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as fh:
+            regressions = compare(report, json.load(fh))
+        for size, name, ratio in regressions:
+            print(f"Регресія: {size} рядків, етап {name}: {ratio:.0%} від базової швидкості")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,117 @@
+import functools
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+DIAGNOSTICS_COLUMNS = ["stage", "seconds", "rows_in", "rows_out", "memory_delta_mb", "peak_mb"]
+
+# tracemalloc працює на весь процес і вмикається лише на час вимірюваних етапів: його вмикає
+# перший етап, що почався, і вимикає останній, що закінчився. Якщо трасування вмикав хтось
+# інший (напр. бенчмарк), його не чіпаємо
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_owned = False
+# Етапи, що вимірюються зараз (у всіх сесіях). Лічильники tracemalloc спільні, тож пам'ять
+# етапу, який перетнувся в часі з іншим вимірюваним етапом, не показується
+_active_stages = set()
+
+
+def _acquire_tracing():
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_owned = True
+        _tracing_users += 1
+
+
+def _release_tracing():
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_owned:
+            tracemalloc.stop()
+            _tracing_owned = False
+
+
+class StageStats:
+    # Змінні результати етапу: rows_out задає код усередині with
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        # Чи перетнувся етап з іншим вимірюваним етапом (тоді пам'ять невідома)
+        self.overlapped = False
+
+
+class Diagnostics:
+    # Час, рядки на вході й виході та пам'ять кожного етапу сторінки.
+    # Вимкнена діагностика нічого не вимірює і не вмикає tracemalloc; увімкнена трасує пам'ять
+    # лише всередині етапів, тож етап можна виміряти й пізніше (напр. при перезапуску фрагмента).
+    # Пам'ять — на весь процес: виділення інших сесій Streamlit, що працюють одночасно,
+    # теж потрапляють у цифри, тож при кількох активних сесіях вони лише орієнтовні
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        stats = StageStats(name, rows_in)
+        if not self.enabled:
+            yield stats
+            return
+        # Звільнення об'єктів, створених до початку трасування, tracemalloc не бачить —
+        # приріст пам'яті етапу рахує виділене під час етапу
+        _acquire_tracing()
+        with _tracing_lock:
+            stats.overlapped = bool(_active_stages)
+            for other in _active_stages:
+                other.overlapped = True
+            _active_stages.add(stats)
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            seconds = time.perf_counter() - started
+            with _tracing_lock:
+                current, peak = tracemalloc.get_traced_memory()
+                _active_stages.discard(stats)
+            _release_tracing()
+            if stats.overlapped:
+                self.record(name, seconds, stats.rows_in, stats.rows_out)
+            else:
+                self.record(name, seconds, stats.rows_in, stats.rows_out, (current - before) / 2**20,
+                            (peak - before) / 2**20)
+
+    def record(self, name, seconds, rows_in=None, rows_out=None, memory_delta_mb=None, peak_mb=None):
+        # Для етапів, виміряних деінде (напр. фонового розбору файлу)
+        if self.enabled:
+            self.stages.append({"stage": name, "seconds": round(seconds, 6), "rows_in": rows_in, "rows_out": rows_out,
+                                "memory_delta_mb": None if memory_delta_mb is None else round(memory_delta_mb, 3),
+                                "peak_mb": None if peak_mb is None else round(peak_mb, 3)})
+
+    def timed(self, name, rows_out=len):
+        # Декоратор: етап — виклик функції, rows_out рахується з її результату
+        def decorate(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.stage(name) as stats:
+                    result = function(*args, **kwargs)
+                    stats.rows_out = rows_out(result) if rows_out is not None else None
+                return result
+            return wrapper
+        return decorate
+
+    def frame(self):
+        return pd.DataFrame(self.stages, columns=DIAGNOSTICS_COLUMNS)
+
+    def to_json(self, **extra):
+        return json.dumps({"created": datetime.now().isoformat(timespec="seconds"), "stages": self.stages, **extra},
+                          ensure_ascii=False, indent=2, default=int)
@@ -0,0 +1,45 @@
+import functools
+import threading
+import weakref
+
+
+class FrameTable:
+    # Значення, прив'язані до конкретного об'єкта DataFrame (DataFrame не хешується,
+    # тому ключ — id, а слабке посилання відсіює записи вже зібраних кадрів)
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, df, default=None):
+        with self._lock:
+            entry = self._entries.get(id(df))
+            if entry is not None and entry[0]() is df:
+                return entry[1]
+        return default
+
+    def set(self, df, value):
+        with self._lock:
+            for key in [key for key, (ref, _) in self._entries.items() if ref() is None]:
+                del self._entries[key]
+            self._entries[id(df)] = (weakref.ref(df), value)
+        return value
+
+
+_MISSING = object()
+
+
+def per_frame(build):
+    # Кешує похідну структуру (індекс, куб) для конкретного об'єкта DataFrame.
+    # Кешований loader повертає той самий об'єкт, тож структура будується один раз на файл
+    table = FrameTable()
+
+    @functools.wraps(build)
+    def get(df):
+        value = table.get(df, _MISSING)
+        if value is _MISSING:
+            value = table.set(df, build(df))
+        return value
+
+    # Вже обчислене значення (напр. зібране інкрементально) можна покласти напряму
+    get.store = table.set
+    return get
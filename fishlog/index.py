@@ -0,0 +1,183 @@
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from fishlog.framecache import per_frame
+from fishlog.schema import SOURCE_COLUMN
+
+# Стовпці, за якими фільтрує бічна панель (source — лише для даних з кількох журналів)
+FILTER_COLUMNS = ["base", "fish", "location", "bait", "bait_type", SOURCE_COLUMN]
+# Стовпці з вибором одного значення
+VALUE_COLUMNS = ["base", "fish", "location", "bait", SOURCE_COLUMN]
+# Значення фільтра, що означає "без обмеження"
+ALL = "Всі"
+# Скільки результатів фільтрації тримає кеш запитів: не більше QUERY_CACHE_SIZE записів
+# і не більше QUERY_CACHE_BYTES байтів масивів позицій (для журналу з мільйонами рядків
+# кожен результат може займати мегабайти)
+QUERY_CACHE_SIZE = 32
+QUERY_CACHE_BYTES = 64 * 2**20
+
+
+QueryKey = namedtuple("QueryKey", ["base", "fish", "location", "bait", "source", "min_weight", "strict", "bait_types"])
+
+
+def normalize_query(base=None, fish=None, location=None, bait=None, min_weight=None, bait_types=None, strict=False,
+                    source=None):
+    # Однакові запити з різним записом ("Всі" чи None, 0 чи 0.0, порядок типів) дають один ключ
+    values = [None if value in (None, ALL) else value for value in (base, fish, location, bait, source)]
+    min_weight = None if min_weight is None else float(min_weight)
+    bait_types = None if bait_types is None else frozenset(bait_types)
+    return QueryKey(*values, min_weight, bool(strict), bait_types)
+
+
+def is_narrower(query, cached):
+    # Чи кожен рядок, що проходить query, проходить і cached
+    for column in VALUE_COLUMNS:
+        value = getattr(cached, column)
+        if value is not None and value != getattr(query, column):
+            return False
+    if cached.bait_types is not None and (query.bait_types is None or not query.bait_types <= cached.bait_types):
+        return False
+    if cached.min_weight is None:
+        return True
+    if query.min_weight is None:
+        return False
+    return query.min_weight > cached.min_weight or (
+        query.min_weight == cached.min_weight and (query.strict or not cached.strict))
+
+
+class QueryCache:
+    # LRU результатів фільтрації. Якщо точного збігу немає, але в кеші є ширший запит
+    # (напр. менша мін. вага або більше типів наживок), новий запит рахується по його
+    # результату, а не по всьому журналу
+    def __init__(self, size=QUERY_CACHE_SIZE, max_bytes=QUERY_CACHE_BYTES):
+        self.size = size
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.subsumed = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, evaluate):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            wider = [rows for cached, rows in self._entries.items() if is_narrower(key, cached)]
+            base = min(wider, key=len) if wider else None
+            if base is None:
+                self.misses += 1
+            else:
+                self.subsumed += 1
+        rows = evaluate(key, base)
+        if rows.nbytes > self.max_bytes:
+            # Результат більший за весь бюджет — не кешуємо, щоб не витіснити все інше
+            return rows
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous.nbytes
+            self._entries[key] = rows
+            self.bytes += rows.nbytes
+            while len(self._entries) > self.size or self.bytes > self.max_bytes:
+                self.bytes -= self._entries.popitem(last=False)[1].nbytes
+        return rows
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "subsumed": self.subsumed, "misses": self.misses, "entries": len(self._entries),
+                    "bytes": self.bytes}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+
+class FilterIndex:
+    # Індекс будується один раз при завантаженні. Рядки впорядковані за спаданням ваги,
+    # тож поріг мін. ваги — це префікс довжини k (searchsorted), а для кожного значення
+    # кожного стовпця зберігається відсортований список позицій у цьому порядку
+    def __init__(self, df):
+        self.cache = QueryCache()
+        weights = df["weight"].to_numpy()
+        self.order = np.argsort(-weights.astype(np.int64), kind="stable")
+        self._neg_weights = -weights[self.order].astype(np.int64)
+        self.codes = {}
+        self.positions = {}
+        self.categories = {}
+        for column in FILTER_COLUMNS:
+            if column not in df.columns:
+                continue
+            values = df[column]
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype("category")
+            codes = values.cat.codes.to_numpy()[self.order]
+            # Один стабільний argsort групує позиції за кодом, зберігаючи порядок ваги
+            grouped = np.argsort(codes, kind="stable")
+            counts = np.bincount(codes[codes >= 0], minlength=len(values.cat.categories))
+            start = np.count_nonzero(codes < 0)
+            bounds = np.concatenate([[start], start + np.cumsum(counts)])
+            self.codes[column] = codes
+            self.categories[column] = {value: code for code, value in enumerate(values.cat.categories)}
+            self.positions[column] = [grouped[bounds[code]:bounds[code + 1]] for code in range(len(counts))]
+
+    def __len__(self):
+        return len(self.order)
+
+    def _weight_prefix(self, min_weight, strict):
+        # Скільки найважчих рядків проходять поріг (weight >= min_weight або > при strict)
+        if min_weight is None:
+            return len(self.order)
+        return int(np.searchsorted(self._neg_weights, -min_weight, side="left" if strict else "right"))
+
+    def query(self, base=None, fish=None, location=None, bait=None, min_weight=None, bait_types=None, strict=False,
+              source=None):
+        # Повертає позиції рядків (для DataFrame.take), впорядковані за спаданням ваги
+        key = normalize_query(base, fish, location, bait, min_weight, bait_types, strict, source)
+        return self.order[self.cache.get(key, self._evaluate)]
+
+    def _evaluate(self, key, candidates=None):
+        # Позиції у порядку ваги, що проходять фільтр. candidates — уже відібрана надмножина
+        # (результат ширшого запиту з кешу); без неї починаємо з найкоротшого списку значення
+        limit = self._weight_prefix(key.min_weight, key.strict)
+        codes = {}
+        for column in VALUE_COLUMNS:
+            value = getattr(key, column)
+            if value is None:
+                continue
+            code = self.categories.get(column, {}).get(value)
+            if code is None:
+                return np.empty(0, dtype=np.intp)
+            codes[column] = code
+        if candidates is None:
+            if codes:
+                column = min(codes, key=lambda column: len(self.positions[column][codes[column]]))
+                candidates = self.positions[column][codes.pop(column)]
+            else:
+                candidates = np.arange(limit)
+        candidates = candidates[:np.searchsorted(candidates, limit)]
+        mask = None
+        for column, code in codes.items():
+            column_mask = self.codes[column][candidates] == code
+            mask = column_mask if mask is None else mask & column_mask
+        if key.bait_types is not None:
+            allowed = np.zeros(len(self.categories["bait_type"]) + 1, dtype=bool)
+            for bait_type in key.bait_types:
+                if bait_type in self.categories["bait_type"]:
+                    allowed[self.categories["bait_type"][bait_type]] = True
+            # Код -1 (порожнє значення) бере останній елемент, який завжди False
+            type_mask = allowed[self.codes["bait_type"][candidates]]
+            mask = type_mask if mask is None else mask & type_mask
+        if mask is not None:
+            candidates = candidates[mask]
+        return candidates
+
+
+# Індекс будується один раз для кожного завантаженого DataFrame
+filter_index = per_frame(FilterIndex)
@@ -0,0 +1,161 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+from fishlog.aggregate import Aggregates
+from fishlog.cube import frame_cube
+from fishlog.index import filter_index
+from fishlog.loader import bytes_key, cached_frame, quarantine_of, store_frame
+from fishlog.records import frame_flags
+from fishlog.sketch import SketchSet, frame_sketches
+from fishlog.sources import map_sources, merge_sources, unique_names
+
+# Розмір фрагмента для фонового розбору (межа завжди припадає на кінець рядка)
+CHUNK_BYTES = 8 * 1024 * 1024
+
+IngestProgress = namedtuple("IngestProgress", ["rows", "rejected", "bytes_done", "bytes_total",
+                                               "fraction", "elapsed"])
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def iter_chunks(data, chunk_bytes=CHUNK_BYTES):
+    # (початок, кінець) фрагментів data, кожен закінчується повним рядком
+    start = 0
+    while start < len(data):
+        end = data.rfind(b"\n", start, start + chunk_bytes) + 1
+        if end <= start:
+            end = data.find(b"\n", start + chunk_bytes)
+            end = len(data) if end < 0 else end + 1
+        yield start, end
+        start = end
+
+
+class IngestJob:
+    # Розбір завантажених файлів фрагментами у фоні. Поки розбір триває, доступні прогрес
+    # (рядки й байти) та попередні агрегати вже розібраних фрагментів.
+    # sources — пари (назва, байти); кілька файлів розбираються в пулі процесів і
+    # зливаються в один DataFrame зі стовпцем source без повторів між журналами
+    def __init__(self, sources, chunk_bytes=CHUNK_BYTES, workers=None):
+        self.key = sources_key(sources)
+        self.df = cached_frame(self.key)
+        self.error = None
+        self._sources = sources if self.df is None else None
+        self._chunk_bytes = chunk_bytes
+        self._workers = 1 if len(sources) == 1 else workers
+        self._parts = []
+        self._aggregates = None
+        self._sketches = None
+        self._rows = 0
+        self._rejected_rows = 0
+        self._bytes_total = sum(len(data) for _, data in sources)
+        self._bytes_done = self._bytes_total if self.df is not None else 0
+        self._started = time.monotonic()
+        self._elapsed = 0.0 if self.df is not None else None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def done(self):
+        return self.df is not None or self.error is not None
+
+    def start(self):
+        if not self.done and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="fishlog-ingest", daemon=True)
+            self._thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.df
+
+    def _tasks(self, sizes):
+        # Завдання для розбору: фрагменти кожного файлу з номером першого рядка фрагмента
+        for name, data in self._sources:
+            first_line = 1
+            for start, end in iter_chunks(data, self._chunk_bytes):
+                chunk = data[start:end]
+                sizes.append(len(chunk))
+                yield name, chunk, first_line
+                first_line += chunk.count(b"\n")
+
+    def _run(self):
+        try:
+            sizes = deque()
+            for frame, rejected in map_sources(self._tasks(sizes), self._workers):
+                aggregates = Aggregates.from_rows(frame) if len(frame) else None
+                sketches = SketchSet.from_frame(frame) if len(frame) else None
+                with self._lock:
+                    self._parts.append((frame, rejected))
+                    self._rows += len(frame)
+                    self._rejected_rows += len(rejected)
+                    if aggregates is not None:
+                        self._aggregates = aggregates if self._aggregates is None else self._aggregates.merge(aggregates)
+                        self._sketches = sketches if self._sketches is None else self._sketches.merge(sketches)
+                    self._bytes_done += sizes.popleft()
+            df = store_frame(self.key, merge_sources(self._parts))
+            # Ескізи фрагментів уже злиті; якщо між журналами були повтори — будуємо їх заново
+            if self._sketches is not None and len(df) == self._rows:
+                frame_sketches.store(df, self._sketches)
+            # Індекс, куб і позначки будуємо тут же, щоб перший запит після розбору був миттєвим
+            filter_index(df)
+            frame_cube(df)
+            frame_flags(df)
+            self.df = df
+        except Exception as e:
+            self.error = e
+        finally:
+            self._elapsed = time.monotonic() - self._started
+            self._sources = None
+            self._parts = []
+
+    def progress(self):
+        with self._lock:
+            rows = len(self.df) if self.df is not None else self._rows
+            rejected = len(quarantine_of(self.df)) if self.df is not None else self._rejected_rows
+            fraction = self._bytes_done / self._bytes_total if self._bytes_total else 1.0
+            elapsed = self._elapsed if self._elapsed is not None else time.monotonic() - self._started
+            return IngestProgress(rows, rejected, self._bytes_done, self._bytes_total, fraction, elapsed)
+
+    def provisional(self):
+        # Агрегати по вже розібраних фрагментах (None, поки не готовий перший фрагмент)
+        with self._lock:
+            return self._aggregates
+
+    def provisional_sketches(self):
+        with self._lock:
+            return self._sketches
+
+
+def sources_key(sources):
+    # Ключ кешу: хеш вмісту одного файлу або назви й хеші всіх файлів
+    if len(sources) == 1 and sources[0][0] is None:
+        return bytes_key(sources[0][1])
+    return ("sources",) + tuple((name,) + bytes_key(data) for name, data in sources)
+
+
+def _ingest(sources, chunk_bytes, workers=None):
+    # Одне фонове завдання на вміст; вже розібрані файли повертаються готовими
+    job = IngestJob(sources, chunk_bytes, workers)
+    if job.done:
+        return job
+    with _jobs_lock:
+        for key in [key for key, running in _jobs.items() if running.done]:
+            del _jobs[key]
+        running = _jobs.get(job.key)
+        if running is None:
+            running = _jobs[job.key] = job.start()
+    return running
+
+
+def ingest_fishlog_bytes(data, chunk_bytes=CHUNK_BYTES):
+    return _ingest([(None, data)], chunk_bytes)
+
+
+def ingest_fishlog_files(files, chunk_bytes=CHUNK_BYTES, workers=None):
+    # files — пари (назва файлу, байти), напр. кілька завантажених журналів
+    files = list(files)
+    names = unique_names([name for name, _ in files])
+    return _ingest([(name, data) for name, (_, data) in zip(names, files)], chunk_bytes, workers)
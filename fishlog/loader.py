@@ -0,0 +1,259 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import pyarrow as pa
+
+from fishlog.arrow_engine import concat_quarantine, empty_quarantine, parse_fishlog_arrow
+from fishlog.baits import BAIT_TAXONOMY
+from fishlog.framecache import FrameTable
+from fishlog.records import frame_flags, record_flags, species_max_weights
+from fishlog.schema import (
+    COLUMN_NAMES,
+    SCHEMA,
+    apply_schema,
+    concat_frames,
+    empty_frame,
+    fits_dtype,
+    time_to_minutes,
+)
+from fishlog.sketch import SketchSet, frame_sketches
+from fishlog.snapshot import append_snapshot, read_snapshot, write_snapshot
+
+# Скільки розібраних файлів тримаємо в пам'яті одночасно
+CACHE_SIZE = 8
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+# Відхилені рядки (карантин) кожного розібраного DataFrame
+_quarantines = FrameTable()
+
+
+def parse_fishlog(source, taxonomy=BAIT_TAXONOMY):
+    # Зчитуємо файл
+    df = pd.read_csv(source, sep=":", names=COLUMN_NAMES, header=None,
+                     dtype={column: "category" for column in ("fish", "bait", "base", "location", "time")})
+    # Час "8-10" одразу переводимо у хвилини від початку доби
+    df["time"] = time_to_minutes(df["time"])
+    # Валідація числових стовпців: як і в розборі pyarrow, відкидаються нечислові, дробові
+    # значення та значення поза діапазоном типу зі SCHEMA
+    valid = df["time"].notna().to_numpy()
+    for column in ("weight", "depth", "id"):
+        df[column] = pd.to_numeric(df[column], errors="coerce")
+        valid &= fits_dtype(df[column].to_numpy(), SCHEMA[column])
+    df = df[valid]
+    # Додаємо стовпець із типом наживки та видаляємо записи з невідомими типами
+    df["bait_type"] = taxonomy.classify(df["bait"])
+    df = df[df["bait_type"].notna()]
+    return apply_schema(df)
+
+
+def parse_fishlog_bytes(data, taxonomy=BAIT_TAXONOMY, first_line=1):
+    # Повертає (df, quarantine). Багатопотоковий розбір pyarrow, де некоректні рядки (зокрема
+    # з байтами не в UTF-8) потрапляють у карантин з номерами рядків (first_line — номер першого рядка data)
+    return parse_fishlog_arrow(data, taxonomy, first_line)
+
+
+def with_quarantine(df, quarantine):
+    _quarantines.set(df, quarantine)
+    return df
+
+
+def quarantine_of(df):
+    # Таблиця відхилених рядків (line, reason, text) для розібраного DataFrame
+    return _quarantines.get(df, empty_quarantine())
+
+
+def _parse_attached(data):
+    return with_quarantine(*parse_fishlog_bytes(data))
+
+
+def _cached(key, parse):
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    df = parse()
+    with _cache_lock:
+        _cache[key] = df
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return df
+
+
+def load_fishlog(path):
+    # Ключ кешу — шлях, час зміни та розмір файлу: поки файл не змінився, повторного розбору немає
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    def parse():
+        with open(path, "rb") as fh:
+            return _parse_attached(fh.read())
+
+    return _cached(("path", path, stat.st_mtime_ns, stat.st_size), parse)
+
+
+def bytes_key(data):
+    # Для завантажених файлів ключ кешу — хеш вмісту
+    return ("bytes", hashlib.sha1(data).hexdigest(), len(data))
+
+
+def load_fishlog_bytes(data):
+    return _cached(bytes_key(data), lambda: _parse_attached(data))
+
+
+def cached_frame(key):
+    with _cache_lock:
+        return _cache.get(key)
+
+
+def store_frame(key, df):
+    return _cached(key, lambda: df)
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+# Скільки байтів з початку файлу запам'ятовуємо, щоб помітити заміну файлу
+_HEAD_SIZE = 256
+
+_followers = {}
+_followers_lock = threading.Lock()
+
+
+class FishlogFollower:
+    # Режим стеження: гра дописує рядки в кінець Fishlog.txt, тому розбираємо
+    # лише нові повні рядки після збереженого зміщення.
+    # З snapshot=True розібрані дані зберігаються у Parquet поруч із файлом,
+    # і наступний запуск читає знімок замість повторного розбору тексту
+    def __init__(self, path, snapshot=True):
+        self.path = os.path.abspath(path)
+        self.snapshot = snapshot
+        self.df = None
+        self.max_weights = {}
+        # Ескізи розподілу ваги видів: для дописаних рядків лише зливаються з наявними
+        self.sketches = None
+        self.offset = 0
+        # Кількість рядків до offset — щоб рядки в карантині мали номери рядків файлу
+        self.lines = 0
+        self.quarantine = empty_quarantine()
+        self._ino = None
+        self._head = b""
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        with self._lock:
+            stat = os.stat(self.path)
+            if self.df is None or self._rotated(stat):
+                self._reload()
+            elif stat.st_size > self.offset:
+                self._read_tail()
+            return self.df
+
+    def _rotated(self, stat):
+        # Файл скорочено або замінено іншим — інкрементальне читання неможливе
+        if stat.st_size < self.offset or stat.st_ino != self._ino:
+            return True
+        with open(self.path, "rb") as fh:
+            return fh.read(len(self._head)) != self._head
+
+    def _reload(self):
+        if self.snapshot and self._restore():
+            return
+        with open(self.path, "rb") as fh:
+            data = fh.read()
+        end = data.rfind(b"\n") + 1
+        self.df, self.quarantine = self._parse(data[:end], 1)
+        with_quarantine(self.df, self.quarantine)
+        self._store_derived()
+        self.offset = end
+        self.lines = data.count(b"\n", 0, end)
+        self._ino = os.stat(self.path).st_ino
+        self._head = data[:min(end, _HEAD_SIZE)]
+        self._save()
+
+    def _restore(self):
+        # Знімок актуальний — беремо його і дочитуємо лише те, що дописано після нього
+        restored = read_snapshot(self.path, tag=BAIT_TAXONOMY.fingerprint)
+        if restored is None:
+            return False
+        self.df, self.offset, self.lines, quarantine = restored
+        self.quarantine = quarantine if quarantine is not None else empty_quarantine()
+        with_quarantine(self.df, self.quarantine)
+        self._store_derived()
+        self._ino = os.stat(self.path).st_ino
+        with open(self.path, "rb") as fh:
+            self._head = fh.read(min(self.offset, _HEAD_SIZE))
+        if os.path.getsize(self.path) > self.offset:
+            self._read_tail()
+        return True
+
+    def _store_derived(self):
+        # Максимуми видів ведуться інкрементально (див. _read_tail), тож позначки записів
+        # рахуються з них, а не повторним групуванням усього кадру в frame_flags
+        self.max_weights = species_max_weights(self.df)
+        self.sketches = frame_sketches(self.df)
+        frame_flags.store(self.df, record_flags(self.df, self.max_weights))
+
+    def _save(self, new=None, previous_offset=None):
+        # Знімок — лише прискорення: помилка запису не повинна заважати аналізу
+        if not self.snapshot:
+            return
+        try:
+            if new is None:
+                write_snapshot(self.path, self.df, self.offset, tag=BAIT_TAXONOMY.fingerprint,
+                               lines=self.lines, quarantine=self.quarantine)
+            else:
+                append_snapshot(self.path, new, self.offset, self.df, tag=BAIT_TAXONOMY.fingerprint,
+                                lines=self.lines, quarantine=self.quarantine, previous_offset=previous_offset)
+        except (OSError, pa.ArrowException):
+            pass
+
+    def _read_tail(self):
+        with open(self.path, "rb") as fh:
+            fh.seek(self.offset)
+            data = fh.read()
+        # Незавершений останній рядок залишаємо до наступного оновлення
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return
+        new, rejected = self._parse(data[:end], self.lines + 1)
+        previous_offset = self.offset
+        self.offset += end
+        self.lines += data.count(b"\n", 0, end)
+        if len(rejected):
+            self.quarantine = concat_quarantine([self.quarantine, rejected])
+        if len(self._head) < _HEAD_SIZE:
+            with open(self.path, "rb") as fh:
+                self._head = fh.read(min(self.offset, _HEAD_SIZE))
+        if not new.empty:
+            self.df = concat_frames([self.df, new])
+            for fish, weight in species_max_weights(new).items():
+                if fish not in self.max_weights or weight > self.max_weights[fish]:
+                    self.max_weights[fish] = weight
+            self.sketches = frame_sketches.store(self.df, self.sketches.merge(SketchSet.from_frame(new)))
+            frame_flags.store(self.df, record_flags(self.df, self.max_weights))
+        with_quarantine(self.df, self.quarantine)
+        self._save(new, previous_offset)
+
+    @staticmethod
+    def _parse(data, first_line):
+        if not data.strip():
+            return empty_frame(), empty_quarantine()
+        return parse_fishlog_bytes(data, first_line=first_line)
+
+
+def follow_fishlog(path, snapshot=True):
+    # Один спостерігач на файл, спільний для всіх перезапусків сторінки
+    path = os.path.abspath(path)
+    with _followers_lock:
+        follower = _followers.get(path)
+        if follower is None:
+            follower = _followers[path] = FishlogFollower(path, snapshot=snapshot)
+    follower.refresh()
+    return follower
@@ -0,0 +1,109 @@
+import numpy as np
+
+from fishlog.framecache import FrameTable, per_frame
+from fishlog.schema import SOURCE_COLUMN, format_time
+from fishlog.sketch import frame_sketches
+
+# Позначки записів: червоний — id > 9999, синій — не менше 80% максимуму виду
+FLAG_NONE, FLAG_TROPHY, FLAG_RED = 0, 1, 2
+FLAG_STYLES = np.array(["", "color: blue", "color: red"], dtype=object)
+TROPHY_SHARE = 0.8
+PAGE_SIZES = [50, 100, 500, 1000]
+
+
+def species_max_weights(df, per_source=False):
+    # Максимальна вага для кожного виду риби (id ≤ 9999): по всіх джерелах
+    # або, з per_source=True, окремо для кожного джерела — {джерело: {риба: вага}}
+    df = df[df["id"] <= 9999]
+    if not per_source:
+        return df.groupby("fish", observed=True)["weight"].max().to_dict()
+    maxima = df.groupby([SOURCE_COLUMN, "fish"], observed=True)["weight"].max()
+    result = {}
+    for (source, fish), weight in maxima.items():
+        result.setdefault(source, {})[fish] = weight
+    return result
+
+
+def record_flags(df, max_weights, per_source=False):
+    # Векторний аналог style_row: максимум виду береться за кодом категорії риби.
+    # З per_source=True max_weights — {джерело: {риба: вага}}, і трофей рахується відносно свого джерела
+    fish = df["fish"]
+    if per_source:
+        sources = df[SOURCE_COLUMN]
+        limits = np.array([[max_weights.get(source, {}).get(name, np.nan) for name in fish.cat.categories] + [np.nan]
+                           for source in sources.cat.categories] + [[np.nan] * (len(fish.cat.categories) + 1)],
+                          dtype=float)
+        limit = limits[sources.cat.codes.to_numpy(), fish.cat.codes.to_numpy()]
+    else:
+        limits = np.array([max_weights.get(name, np.nan) for name in fish.cat.categories] + [np.nan], dtype=float)
+        limit = limits[fish.cat.codes.to_numpy()]
+    return _flags(df, TROPHY_SHARE * limit)
+
+
+def threshold_flags(df, thresholds):
+    # Трофей — вага понад поріг своєї групи; thresholds — Series з індексом за рибою
+    # (або рибою і базою/локацією), напр. p90 з ескізів ваги
+    keys = list(thresholds.index.names)
+    columns = [df[key] for key in keys]
+    limits = np.full([len(column.cat.categories) + 1 for column in columns], np.nan)
+    positions = [column.cat.categories.get_indexer(thresholds.index.get_level_values(key))
+                 for column, key in zip(columns, keys)]
+    known = np.logical_and.reduce([position >= 0 for position in positions])
+    limits[tuple(position[known] for position in positions)] = thresholds.to_numpy()[known]
+    # Код -1 (порожнє значення) бере останній елемент, який завжди NaN
+    return _flags(df, limits[tuple(column.cat.codes.to_numpy() for column in columns)])
+
+
+def _flags(df, limit):
+    flags = np.full(len(df), FLAG_NONE, dtype=np.int8)
+    flags[df["weight"].to_numpy() > limit] = FLAG_TROPHY
+    flags[df["id"].to_numpy() > 9999] = FLAG_RED
+    return flags
+
+
+def _frame_flags(df):
+    return record_flags(df, species_max_weights(df))
+
+
+def _source_flags(df):
+    return record_flags(df, species_max_weights(df, per_source=True), per_source=True)
+
+
+# Позначки обчислюються один раз для кожного завантаженого DataFrame
+frame_flags = per_frame(_frame_flags)
+# Те саме, але трофеї відносно максимуму виду у своєму джерелі
+source_flags = per_frame(_source_flags)
+
+_quantile_flags = FrameTable()
+
+
+def quantile_flags(df, quantile, breakdown="fish"):
+    # Трофей — вага понад квантиль (напр. p90) виду загалом, виду на базі чи на локації.
+    # Пороги беруться з ескізів ваги; позначки кешуються для кадру й правила
+    cache = _quantile_flags.get(df)
+    if cache is None:
+        cache = _quantile_flags.set(df, {})
+    key = (quantile, breakdown)
+    if key not in cache:
+        cache[key] = threshold_flags(df, frame_sketches(df)[breakdown].thresholds(quantile))
+    return cache[key]
+
+
+def page_count(total, page_size):
+    return max(1, -(-total // page_size))
+
+
+def take_page(df, rows, page, page_size, flags=None):
+    # Лише рядки видимої сторінки (у порядку rows) та їхні позначки; час уже відформатовано
+    if flags is None:
+        flags = frame_flags(df)
+    page_rows = rows[(page - 1) * page_size:page * page_size]
+    records = df.take(page_rows)
+    return records.assign(time=format_time(records["time"])), flags[page_rows]
+
+
+def record_page(df, rows, page, page_size, flags=None):
+    # Стилізується і передається у браузер лише видима сторінка вже впорядкованих рядків
+    records, page_flags = take_page(df, rows, page, page_size, flags)
+    styles = np.repeat(FLAG_STYLES[page_flags][:, None], records.shape[1], axis=1)
+    return records.style.apply(lambda _: styles, axis=None)
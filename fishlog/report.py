@@ -0,0 +1,292 @@
+import argparse
+import hashlib
+import html
+import importlib.util
+import json
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import combinations
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+from fishlog.backend import open_backend
+from fishlog.cube import query_aggregates
+from fishlog.index import ALL, filter_index
+from fishlog.records import frame_flags, record_page, take_page
+from fishlog.schema import COLUMN_NAMES
+
+# Пакетні звіти: ті самі зведення, таблиці й графіки, що в app.py, для кожного поєднання
+# бази, риби (і, за бажання, локації), включно з "усі бази" / "усі риби"
+REPORT_DIMENSIONS = ["base", "fish", "location"]
+DEFAULT_BY = ["base", "fish"]
+DEFAULT_OUT = "reports"
+FORMATS = ["html", "csv", "png"]
+DEFAULT_TOP_N = 10
+DEFAULT_RECORDS = 20
+# Змінюється разом з вмістом звіту — тоді всі зрізи генеруються заново
+REPORT_VERSION = 1
+MANIFEST = "manifest.json"
+SLICES_DIR = "slices"
+SUMMARY_COLUMNS = ["mean_weight", "max_weight", "fish_count", "max_depth", "min_depth"]
+DIMENSION_TITLES = {"base": "База", "fish": "Риба", "location": "Локація"}
+
+_UNSAFE = re.compile(r'[\\/:*?"<>|\s]+')
+
+# Дані процесу-виконавця: завантажуються один раз при старті процесу
+_worker_df = None
+
+
+def load_log(spec):
+    # Той самий журнал, що бачать застосунки (файл, каталог чи glob-шаблон)
+    return open_backend(spec, "memory").df
+
+
+def slice_slug(values):
+    # Ім'я каталогу зрізу: читабельні назви й короткий хеш (назви можуть збігтися після заміни символів)
+    digest = hashlib.blake2b(json.dumps(values, ensure_ascii=False).encode("utf-8"), digest_size=4).hexdigest()
+    parts = ["all" if value == ALL else (_UNSAFE.sub("_", str(value)).strip("_") or "_") for value in values]
+    return "__".join(parts + [digest])
+
+
+def plan_slices(df, by, options):
+    # Усі непорожні зрізи з відбитком їхніх вхідних рядків. Відбиток — хеш вмісту рядків
+    # зрізу, максимумів ваги його видів (від них залежать позначки трофеїв) і параметрів звіту
+    row_hash = pd.util.hash_pandas_object(df[COLUMN_NAMES], index=False).to_numpy()
+    fish_codes = df["fish"].cat.codes.to_numpy()
+    ordinary = df["id"].to_numpy() <= 9999
+    species_max = np.zeros(len(df["fish"].cat.categories), dtype=np.int64)
+    np.maximum.at(species_max, fish_codes[ordinary], df["weight"].to_numpy()[ordinary])
+    settings = json.dumps(options, sort_keys=True).encode("utf-8")
+
+    slices = {}
+    for size in range(len(by) + 1):
+        for dims in combinations(by, size):
+            groups = df.groupby(list(dims), observed=True, sort=True).indices if dims else {(): np.arange(len(df))}
+            for key, positions in groups.items():
+                key = key if isinstance(key, tuple) else (key,)
+                chosen = dict(zip(dims, key))
+                values = [chosen.get(column, ALL) for column in by]
+                digest = hashlib.blake2b(settings, digest_size=16)
+                digest.update(np.sort(row_hash[positions]).tobytes())
+                digest.update(species_max[np.unique(fish_codes[positions])].tobytes())
+                slices[slice_slug(values)] = {
+                    **dict(zip(by, values)),
+                    "count": len(positions),
+                    "max_weight": int(df["weight"].to_numpy()[positions].max()),
+                    "fingerprint": digest.hexdigest(),
+                }
+    return slices
+
+
+def _init_worker(spec):
+    global _worker_df
+    _worker_df = load_log(spec)
+
+
+def _bar(x, y, title, x_title, y_title, orientation="v", text=None, height=None):
+    # Специфікація стовпчикової діаграми для Plotly.newPlot; побудова об'єктів plotly.express
+    # для сотень зрізів займала більшу частину часу генерації
+    trace = {"type": "bar", "x": list(x), "y": list(y), "orientation": orientation}
+    if text is not None:
+        trace.update(text=list(text), textposition="auto")
+    layout = {"title": {"text": title}, "xaxis": {"title": {"text": x_title}}, "yaxis": {"title": {"text": y_title}},
+              "showlegend": False}
+    if height is not None:
+        layout["height"] = height
+    return {"data": [trace], "layout": layout}
+
+
+def _charts(agg, top_n):
+    # Ті самі графіки, що в app.py
+    hourly_count, hourly_weight, depth = agg.hourly_count(), agg.hourly_weight(), agg.depth_hist()
+    bait_stats = agg.top_baits(top_n)
+    return {
+        "hourly_count": _bar(hourly_count.index.tolist(), hourly_count.tolist(), "Кількість риб по годинах",
+                             "Година", "Кількість риб"),
+        "hourly_weight": _bar(hourly_weight.index.tolist(), hourly_weight.tolist(), "Сумарна вага по годинах",
+                              "Година", "Сумарна вага (г)"),
+        "depth": _bar(depth.index.tolist(), depth.tolist(), "Розподіл кількості виловів по діапазонах глибини (м)",
+                      "Діапазон глибини (м)", "Кількість виловів"),
+        "top_baits": _bar(bait_stats["mean_weight"].tolist(), bait_stats["bait"].tolist(),
+                          f"Середня вага риби для топ-{top_n} наживок (кількість риб у підписах)",
+                          "Середня вага (г)", "Наживка", orientation="h",
+                          text=[f"{x} риб" for x in bait_stats["fish_count"].tolist()], height=200 + top_n * 30),
+    }
+
+
+def _chart_html(name, chart):
+    spec = json.dumps(chart, ensure_ascii=False).replace("</", "<\\/")
+    return (f'<div id="{name}"></div><script>(function(c){{c.layout.template = FISHLOG_TEMPLATE;'
+            f'Plotly.newPlot("{name}", c.data, c.layout, {{responsive: true}});}})({spec});</script>')
+
+
+def _write_scripts(out_dir):
+    # plotly.js і шаблон оформлення plotly за замовчуванням — один раз на всі звіти
+    import plotly.io as pio
+    import plotly.offline
+
+    script = os.path.join(out_dir, "plotly.min.js")
+    if not os.path.exists(script):
+        with open(script, "w", encoding="utf-8") as fh:
+            fh.write(plotly.offline.get_plotlyjs())
+    template = pio.templates[pio.templates.default].to_plotly_json()
+    with open(os.path.join(out_dir, "report.js"), "w", encoding="utf-8") as fh:
+        fh.write(f"var FISHLOG_TEMPLATE = {json.dumps(template)};\n")
+
+
+def _title(entry, by):
+    return ", ".join(f"{DIMENSION_TITLES[column]}: {entry[column] if entry[column] != ALL else 'всі'}" for column in by)
+
+
+def render_slice(slug, entry, by, out_dir, options, df=None):
+    # Звіт одного зрізу — та сама фільтрація й агрегація, що після "Оновити" в app.py
+    df = _worker_df if df is None else df
+    query = {column: entry[column] for column in by}
+    rows = filter_index(df).query(**query)
+    agg = query_aggregates(df, rows, **query)
+    top_n, records, formats = options["top_n"], options["records"], options["formats"]
+    tables = {
+        "summary_bait": agg.summary("bait")[SUMMARY_COLUMNS],
+        "summary_fish": agg.summary("fish")[SUMMARY_COLUMNS],
+        "hourly": pd.DataFrame({"count": agg.hourly_count(), "weight_sum": agg.hourly_weight()}).rename_axis("hour"),
+        "depth": agg.depth_hist().rename_axis("depth").to_frame(),
+        "top_baits": agg.top_baits(top_n).set_index("bait"),
+    }
+
+    directory = os.path.join(out_dir, SLICES_DIR, slug)
+    tmp = directory + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    if "csv" in formats:
+        for name, table in tables.items():
+            table.to_csv(os.path.join(tmp, f"{name}.csv"), encoding="utf-8-sig")
+        take_page(df, rows, 1, records)[0].to_csv(os.path.join(tmp, "records.csv"), index=False, encoding="utf-8-sig")
+    charts = _charts(agg, top_n) if {"html", "png"} & set(formats) else {}
+    if "png" in formats:
+        import plotly.graph_objects as go
+
+        for name, chart in charts.items():
+            go.Figure(chart).write_image(os.path.join(tmp, f"{name}.png"))
+    if "html" in formats:
+        title = html.escape(_title(entry, by))
+        body = [f"<h1>{title}</h1>", f"<p>Всього записів: {len(rows)}</p>",
+                "<h2>Зведення за наживкою</h2>", tables["summary_bait"].to_html(),
+                "<h2>Зведення за рибою</h2>", tables["summary_fish"].to_html(),
+                f"<h2>Перші {records} записів (відсортовані за вагою)</h2>",
+                record_page(df, rows, 1, records, frame_flags(df)).hide(axis="index").to_html()]
+        body += [_chart_html(name, chart) for name, chart in charts.items()]
+        _write_page(os.path.join(tmp, "index.html"), title, body, scripts=["../../plotly.min.js", "../../report.js"],
+                    back="../../index.html")
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp, directory)
+    return slug
+
+
+def _write_page(path, title, body, scripts=(), back=None):
+    head = "".join(f'<script src="{src}"></script>' for src in scripts)
+    nav = f'<p><a href="{back}">← усі звіти</a></p>' if back else ""
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(f'<!DOCTYPE html><html lang="uk"><head><meta charset="utf-8"><title>{title}</title>{head}'
+                 f'<style>body{{font-family:sans-serif;margin:2em}}table{{border-collapse:collapse}}'
+                 f'td,th{{border:1px solid #ccc;padding:2px 6px}}</style></head>'
+                 f'<body>{nav}{"".join(body)}</body></html>')
+
+
+def write_index(out_dir, slices, by, formats, created):
+    rows = []
+    for slug, entry in sorted(slices.items(), key=lambda item: [str(item[1][column]) for column in by]):
+        cells = "".join(f"<td>{html.escape(str(entry[column]) if entry[column] != ALL else 'всі')}</td>"
+                        for column in by)
+        links = []
+        if "html" in formats:
+            links.append(f'<a href="{SLICES_DIR}/{slug}/index.html">звіт</a>')
+        if "csv" in formats:
+            links.append(f'<a href="{SLICES_DIR}/{slug}/summary_bait.csv">CSV</a>')
+        rows.append(f"<tr>{cells}<td>{entry['count']}</td><td>{entry['max_weight']}</td><td>{' '.join(links)}</td></tr>")
+    header = "".join(f"<th>{DIMENSION_TITLES[column]}</th>" for column in by)
+    body = [f"<h1>Звіти риболовлі</h1><p>Створено {created}, зрізів: {len(slices)}</p>",
+            f"<table><tr>{header}<th>Записів</th><th>Макс. вага</th><th></th></tr>{''.join(rows)}</table>"]
+    _write_page(os.path.join(out_dir, "index.html"), "Звіти риболовлі", body)
+
+
+def _read_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def generate_reports(spec, out_dir=DEFAULT_OUT, by=DEFAULT_BY, workers=None, top_n=DEFAULT_TOP_N,
+                     records=DEFAULT_RECORDS, formats=FORMATS, force=False):
+    # Генерує звіти всіх зрізів; зрізи, чиї вхідні рядки не змінилися з минулого запуску,
+    # пропускаються. Повертає {"total", "rendered", "skipped", "removed", "seconds"}
+    started = time.perf_counter()
+    by = [column for column in REPORT_DIMENSIONS if column in by]
+    formats = [fmt for fmt in FORMATS if fmt in formats]
+    if "png" in formats and importlib.util.find_spec("kaleido") is None:
+        # Для PNG plotly потрібен пакет kaleido
+        print("PNG пропущено: не встановлено kaleido (pip install kaleido)")
+        formats.remove("png")
+    options = {"version": REPORT_VERSION, "by": by, "top_n": top_n, "records": records, "formats": formats}
+    df = load_log(spec)
+    slices = plan_slices(df, by, options)
+    previous = {} if force else _read_manifest(out_dir).get("slices", {})
+    pending = [slug for slug, entry in slices.items()
+               if previous.get(slug, {}).get("fingerprint") != entry["fingerprint"]
+               or not os.path.isdir(os.path.join(out_dir, SLICES_DIR, slug))]
+
+    os.makedirs(os.path.join(out_dir, SLICES_DIR), exist_ok=True)
+    if "html" in formats:
+        _write_scripts(out_dir)
+    workers = min(workers or os.cpu_count() or 1, len(pending))
+    if workers <= 1:
+        for slug in pending:
+            render_slice(slug, slices[slug], by, out_dir, options, df)
+    else:
+        # Пул — spawn, як у sources.map_sources; кожен виконавець завантажує журнал один раз
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                                 initializer=_init_worker, initargs=(spec,)) as pool:
+            list(pool.map(render_slice, pending, [slices[slug] for slug in pending], [by] * len(pending),
+                          [out_dir] * len(pending), [options] * len(pending),
+                          chunksize=max(1, len(pending) // (workers * 4))))
+
+    removed = [slug for slug in previous if slug not in slices]
+    for slug in removed:
+        shutil.rmtree(os.path.join(out_dir, SLICES_DIR, slug), ignore_errors=True)
+    created = datetime.now().isoformat(timespec="seconds")
+    write_index(out_dir, slices, by, formats, created)
+    with open(os.path.join(out_dir, MANIFEST), "w", encoding="utf-8") as fh:
+        json.dump({"created": created, "options": options, "slices": slices}, fh, ensure_ascii=False, indent=1)
+    return {"total": len(slices), "rendered": len(pending), "skipped": len(slices) - len(pending),
+            "removed": len(removed), "seconds": round(time.perf_counter() - started, 3)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетні звіти Fishlog для кожної бази, риби й локації")
+    parser.add_argument("path", nargs="?", default=os.environ.get("FISHLOG_PATH", "Fishlog.txt"),
+                        help="файл, каталог або glob-шаблон журналів")
+    parser.add_argument("--out", default=DEFAULT_OUT, help="каталог звітів")
+    parser.add_argument("--by", nargs="+", choices=REPORT_DIMENSIONS, default=DEFAULT_BY,
+                        help="розрізи звітів (усі поєднання, включно з 'всі')")
+    parser.add_argument("--workers", type=int, help="скільки процесів генерують звіти")
+    parser.add_argument("--top-n", type=int, default=DEFAULT_TOP_N, help="кількість наживок у графіку")
+    parser.add_argument("--records", type=int, default=DEFAULT_RECORDS, help="скільки найважчих записів у звіті")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=FORMATS)
+    parser.add_argument("--force", action="store_true", help="згенерувати всі зрізи заново")
+    args = parser.parse_args(argv)
+    result = generate_reports(args.path, args.out, args.by, args.workers, args.top_n, args.records, args.formats,
+                              args.force)
+    print(f"Зрізів: {result['total']}, згенеровано: {result['rendered']}, без змін: {result['skipped']}, "
+          f"видалено: {result['removed']}, {result['seconds']} с. Звіти: {os.path.join(args.out, 'index.html')}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
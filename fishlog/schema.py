@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+# Поля рядка Fishlog.txt у порядку запису
+COLUMN_NAMES = ["fish", "weight", "bait", "base", "location", "id", "time", "depth"]
+
+# Стовпець джерела (файлу журналу) є лише в даних, зібраних з кількох журналів
+SOURCE_COLUMN = "source"
+
+# Компактна схема запису про улов: текстові виміри — категорії,
+# числа — малі цілі, час — хвилини від початку доби
+CATEGORY_COLUMNS = ["fish", "bait", "base", "location", "bait_type", SOURCE_COLUMN]
+SCHEMA = {
+    "fish": "category",
+    "weight": np.int32,  # грами, буває понад 65 кг
+    "bait": "category",
+    "base": "category",
+    "location": "category",
+    "id": np.int32,
+    "time": np.int16,  # хвилини від 00:00
+    "depth": np.int16,
+    "bait_type": "category",
+}
+
+
+# Підписи "HH:MM" для всіх 1440 хвилин доби — форматування зводиться до вибірки за індексом
+TIME_LABELS = [f"{minute // 60:02d}:{minute % 60:02d}" for minute in range(24 * 60)]
+
+
+def time_to_minutes(values):
+    # "8-10" -> 490; некоректний час -> NaN.
+    # Різних значень часу не більше 1440, тож розбираємо лише унікальні і роздаємо через коди
+    codes, uniques = pd.factorize(values)
+    parts = pd.Series(uniques, dtype="string").str.partition("-")
+    hours = pd.to_numeric(parts[0], errors="coerce")
+    minutes = pd.to_numeric(parts[2], errors="coerce")
+    parsed = (hours * 60 + minutes).where(hours.between(0, 23) & minutes.between(0, 59))
+    lookup = np.append(parsed.to_numpy(dtype=float), np.nan)
+    return pd.Series(lookup[codes], index=values.index, name=values.name)
+
+
+def hour_of(minutes):
+    return minutes // 60
+
+
+def format_time(minutes):
+    # Зворотне перетворення лише для відображених рядків: 490 -> "08:10".
+    # Категорія з кодами-хвилинами не створює нових рядків
+    minutes = pd.Series(minutes)
+    return pd.Series(pd.Categorical.from_codes(minutes.to_numpy(), categories=TIME_LABELS),
+                     index=minutes.index, name=minutes.name)
+
+
+def fits_dtype(values, dtype):
+    # Маска значень, які цілий dtype зберігає точно: скінченні, без дробової частини, в межах діапазону
+    # Порожня сторінка з бази дає object-стовпці — їх зводимо до чисел (нечислове стає NaN)
+    values = np.asarray(values)
+    if not values.size:
+        return np.ones(values.shape, dtype=bool)
+    if values.dtype.kind == "O":
+        values = np.asarray(pd.to_numeric(values, errors="coerce"), dtype=float)
+    info = np.iinfo(dtype)
+    if values.dtype.kind in "iub":
+        return (values >= info.min) & (values <= info.max)
+    with np.errstate(invalid="ignore"):
+        return np.isfinite(values) & (values == np.floor(values)) & (values >= info.min) & (values <= info.max)
+
+
+def apply_schema(df):
+    # Компактні цілі типи — лише якщо значення в них вміщуються без втрат; інакше стовпець
+    # отримує ширший тип (int64 або, для дробових чи відсутніх значень, float64)
+    schema = {**SCHEMA, SOURCE_COLUMN: "category"}
+    dtypes = {}
+    for column, dtype in schema.items():
+        if column not in df.columns:
+            continue
+        if dtype != "category":
+            values = df[column].to_numpy()
+            if not fits_dtype(values, dtype).all():
+                dtype = np.int64 if fits_dtype(values, np.int64).all() else np.float64
+        dtypes[column] = dtype
+    return df.astype(dtypes)
+
+
+def empty_frame():
+    return apply_schema(pd.DataFrame({column: [] for column in SCHEMA}))
+
+
+def concat_frames(frames):
+    # pd.concat перетворює категорії з різними наборами значень на object,
+    # тому спершу зводимо категорії до спільного об'єднання
+    frames = [frame for frame in frames if len(frame)]
+    if not frames:
+        return empty_frame()
+    for column in CATEGORY_COLUMNS:
+        if all(column in frame.columns for frame in frames):
+            categories = pd.api.types.union_categoricals([frame[column] for frame in frames]).categories
+            frames = [frame.assign(**{column: frame[column].cat.set_categories(categories)}) for frame in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def memory_report(df):
+    # Обсяг пам'яті кожного стовпця (з урахуванням рядків усередині категорій)
+    usage = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        "dtype": df.dtypes.astype(str),
+        "bytes": usage,
+        "bytes_per_row": (usage / max(len(df), 1)).round(2),
+    })
+    report.loc["Всього"] = ["", usage.sum(), round(usage.sum() / max(len(df), 1), 2)]
+    return report
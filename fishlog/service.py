@@ -0,0 +1,368 @@
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import numpy as np
+import pandas as pd
+
+from fishlog.aggregate import Aggregates
+from fishlog.backend import open_backend
+from fishlog.index import ALL, normalize_query
+
+# Локальна служба запитів: журнал завантажується один раз, а застосунки й скрипти
+# отримують фільтри, зведення, години, глибину й топ наживок у JSON
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_URL = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}"
+# Скільки запитів обробляється одночасно
+WORKERS = 8
+# Скільки готових відповідей тримає кеш (найдавніше використані витісняються)
+RESPONSE_CACHE_SIZE = 256
+# Як часто (секунд) перевіряється, чи гра дописала журнал
+REFRESH_SECONDS = 2.0
+# Параметри запиту, що не є фільтром (ключ кешу містить їх окремо від нормалізованого фільтра)
+OPTION_PARAMS = ("column", "group_by", "top_n", "page", "page_size")
+# Параметри групування як у бічній панелі
+GROUP_BY = {"Наживка": "bait", "Риба": "fish", "bait": "bait", "fish": "fish"}
+DEFAULT_TOP_N = 10
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 10_000
+
+
+class QueryError(ValueError):
+    # Неправильні параметри запиту -> відповідь 400
+    pass
+
+
+def _text(params, name, default=None):
+    values = params.get(name)
+    return values[-1] if values else default
+
+
+def _number(params, name, default, kind=float):
+    value = _text(params, name)
+    if value in (None, ""):
+        return default
+    try:
+        return kind(value)
+    except ValueError:
+        raise QueryError(f"Параметр {name} має бути числом: {value!r}") from None
+
+
+def parse_query(params):
+    # Параметри URL (як у бічній панелі) -> аргументи запиту бекенда.
+    # bait_types — список через кому або кілька параметрів bait_type; порожній список не пропускає нічого
+    query = {column: _text(params, column, ALL) for column in ("base", "fish", "location", "bait", "source")}
+    query["min_weight"] = _number(params, "min_weight", None)
+    query["strict"] = _text(params, "strict", "0").lower() in ("1", "true", "yes")
+    if "bait_types" in params or "bait_type" in params:
+        bait_types = [name for value in params.get("bait_types", []) for name in value.split(",") if name]
+        query["bait_types"] = bait_types + params.get("bait_type", [])
+    return query
+
+
+def _records_payload(records, flags):
+    return {"columns": list(records.columns), "data": records.astype(object).to_numpy().tolist(),
+            "flags": np.asarray(flags).tolist()}
+
+
+def _frame_payload(frame):
+    return frame.reset_index().to_dict(orient="records")
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} не серіалізується в JSON")
+
+
+def _endpoint_health(service, backend, params, query):
+    return {"status": "ok", "backend": service.kind, "rows": backend.count(), "generation": service.generation,
+            "cache_hits": service.hits, "cache_misses": service.misses}
+
+
+def _endpoint_columns(service, backend, params, query):
+    return backend.columns
+
+
+def _endpoint_values(service, backend, params, query):
+    column = _text(params, "column")
+    if column not in backend.columns:
+        raise QueryError(f"Невідомий стовпець {column!r}")
+    return backend.values(column)
+
+
+def _endpoint_quarantine(service, backend, params, query):
+    return backend.quarantine().to_dict(orient="records")
+
+
+def _endpoint_count(service, backend, params, query):
+    return {"count": backend.count(**query)}
+
+
+def _endpoint_aggregates(service, backend, params, query):
+    # Повні зведення (для клієнтського бекенда); решта панелей — їхні зрізи
+    return backend.aggregates(**query).to_dict()
+
+
+def _endpoint_summary(service, backend, params, query):
+    group_by = _text(params, "group_by", "bait")
+    if group_by not in GROUP_BY:
+        raise QueryError(f"group_by має бути одним з: {', '.join(GROUP_BY)}")
+    return _frame_payload(backend.aggregates(**query).summary(GROUP_BY[group_by]))
+
+
+def _endpoint_hourly(service, backend, params, query):
+    agg = backend.aggregates(**query)
+    return _frame_payload(pd.DataFrame({"count": agg.hourly_count(), "weight_sum": agg.hourly_weight()})
+                          .rename_axis("hour"))
+
+
+def _endpoint_depth(service, backend, params, query):
+    return _frame_payload(backend.aggregates(**query).depth_hist().rename_axis("depth"))
+
+
+def _endpoint_top_baits(service, backend, params, query):
+    top_n = _number(params, "top_n", DEFAULT_TOP_N, int)
+    if top_n < 1:
+        raise QueryError("top_n має бути не менше 1")
+    return backend.aggregates(**query).top_baits(top_n).to_dict(orient="records")
+
+
+def _endpoint_records(service, backend, params, query):
+    page = _number(params, "page", 1, int)
+    page_size = _number(params, "page_size", DEFAULT_PAGE_SIZE, int)
+    if page < 1 or not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise QueryError(f"page має бути не менше 1, page_size — від 1 до {MAX_PAGE_SIZE}")
+    return {"total": backend.count(**query), "page": page, "page_size": page_size,
+            **_records_payload(*backend.records(page, page_size, **query))}
+
+
+ENDPOINTS = {
+    "/health": _endpoint_health,
+    "/columns": _endpoint_columns,
+    "/values": _endpoint_values,
+    "/quarantine": _endpoint_quarantine,
+    "/count": _endpoint_count,
+    "/aggregates": _endpoint_aggregates,
+    "/summary": _endpoint_summary,
+    "/hourly": _endpoint_hourly,
+    "/depth": _endpoint_depth,
+    "/top_baits": _endpoint_top_baits,
+    "/records": _endpoint_records,
+}
+# Відповіді, що не кешуються (стан самої служби)
+UNCACHED = {"/health"}
+
+
+def _data_state(backend):
+    # Що змінюється разом з даними: DataFrame у пам'яті або лічильник версії бази
+    return getattr(backend, "df", None), getattr(backend, "version", None)
+
+
+class QueryService:
+    # Бекенд, відкритий один раз, і кеш готових JSON-відповідей. Кеш ключується
+    # нормалізованими параметрами й поколінням даних: коли журнал дописано, покоління
+    # зростає і старі відповіді відкидаються
+    def __init__(self, spec, kind=None, database=None, cache_size=RESPONSE_CACHE_SIZE,
+                 refresh_seconds=REFRESH_SECONDS):
+        self.spec = spec
+        # Сама служба читає дані з файлу чи бази (FISHLOG_BACKEND=http — налаштування її клієнтів)
+        self.kind = kind or os.environ.get("FISHLOG_BACKEND", "memory")
+        if self.kind == "http":
+            self.kind = "memory"
+        self.database = database
+        self.cache_size = cache_size
+        self.refresh_seconds = refresh_seconds
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.backend = open_backend(spec, self.kind, database)
+        self._state = _data_state(self.backend)
+        self._checked = time.monotonic()
+
+    def refresh(self, force=False):
+        # Дочитує журнал не частіше ніж раз на refresh_seconds; повертає поточний бекенд
+        with self._lock:
+            if force or time.monotonic() - self._checked >= self.refresh_seconds:
+                backend = open_backend(self.spec, self.kind, self.database)
+                state = _data_state(backend)
+                if state[0] is not self._state[0] or state[1] != self._state[1]:
+                    self.backend, self._state = backend, state
+                    self.generation += 1
+                    self._cache.clear()
+                self._checked = time.monotonic()
+            return self.backend, self.generation
+
+    def warm(self):
+        # Індекс фільтрів і куб будуються до першого запиту
+        self.backend.aggregates()
+        self.backend.count()
+
+    def handle(self, path, params):
+        # (статус, JSON-байти) для шляху й параметрів URL
+        endpoint = ENDPOINTS.get(path)
+        if endpoint is None:
+            return 404, self._encode({"error": f"Невідомий шлях {path}", "endpoints": sorted(ENDPOINTS)})
+        try:
+            backend, generation = self.refresh()
+            query = parse_query(params)
+            key = (generation, path, normalize_query(**query), tuple(_text(params, name) for name in OPTION_PARAMS))
+            if path not in UNCACHED:
+                with self._lock:
+                    body = self._cache.get(key)
+                    if body is not None:
+                        self._cache.move_to_end(key)
+                        self.hits += 1
+                        return 200, body
+            body = self._encode(endpoint(self, backend, params, query))
+        except QueryError as e:
+            return 400, self._encode({"error": str(e)})
+        if path not in UNCACHED:
+            with self._lock:
+                self.misses += 1
+                if generation == self.generation:
+                    self._cache[key] = body
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+        return 200, body
+
+    @staticmethod
+    def _encode(payload):
+        return json.dumps(payload, ensure_ascii=False, default=_json_default).encode("utf-8")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "FishlogService"
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        params = urllib.parse.parse_qs(url.query, keep_blank_values=True)
+        try:
+            status, body = self.server.service.handle(url.path.rstrip("/") or "/", params)
+        except Exception as e:
+            status, body = 500, QueryService._encode({"error": str(e)})
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ServiceServer(HTTPServer):
+    # HTTP-сервер, що передає кожне з'єднання в пул із workers потоків
+    # (замість нового потоку на кожен запит, як у ThreadingHTTPServer)
+    daemon_threads = True
+
+    def __init__(self, address, service, workers=WORKERS, verbose=False):
+        super().__init__(address, _Handler)
+        self.service = service
+        self.verbose = verbose
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="fishlog-service")
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+def serve(spec, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=WORKERS, kind=None, database=None, verbose=False):
+    # Завантажує дані, будує індекси й обслуговує запити до переривання
+    service = QueryService(spec, kind, database)
+    service.warm()
+    server = ServiceServer((host, port), service, workers, verbose)
+    print(f"Fishlog: {service.backend.count()} записів ({service.kind}), http://{host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+class ServiceBackend:
+    # Клієнт служби з тими самими методами, що й MemoryBackend чи SqlBackend:
+    # застосунки працюють через службу без змін (FISHLOG_BACKEND=http)
+    def __init__(self, url=None, timeout=30):
+        self.url = (url or os.environ.get("FISHLOG_SERVICE", DEFAULT_URL)).rstrip("/")
+        self.timeout = timeout
+
+    def get(self, path, **params):
+        params = {name: value for name, value in params.items() if value is not None}
+        if isinstance(params.get("bait_types"), (list, tuple, set, frozenset)):
+            params["bait_type"] = list(params.pop("bait_types"))
+            if not params["bait_type"]:
+                params["bait_types"] = ""
+        url = f"{self.url}{path}?{urllib.parse.urlencode(params, doseq=True)}"
+        try:
+            with urllib.request.urlopen(url, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            raise ValueError(json.loads(e.read()).get("error", str(e))) from None
+
+    @property
+    def columns(self):
+        return self.get("/columns")
+
+    def values(self, column):
+        return self.get("/values", column=column)
+
+    def quarantine(self):
+        from fishlog.arrow_engine import empty_quarantine
+
+        rows = self.get("/quarantine")
+        return pd.DataFrame(rows) if rows else empty_quarantine()
+
+    def count(self, **query):
+        return self.get("/count", **query)["count"]
+
+    def aggregates(self, **query):
+        return Aggregates.from_dict(self.get("/aggregates", **query))
+
+    def records(self, page, page_size, **query):
+        payload = self.get("/records", page=page, page_size=page_size, **query)
+        records = pd.DataFrame(payload["data"], columns=payload["columns"]).infer_objects()
+        return records, np.asarray(payload["flags"], dtype=np.int8)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Локальна HTTP/JSON служба запитів до журналу Fishlog")
+    parser.add_argument("path", nargs="?", default=os.environ.get("FISHLOG_PATH", "Fishlog.txt"),
+                        help="файл, каталог або glob-шаблон журналів")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=WORKERS, help="скільки запитів обробляти одночасно")
+    parser.add_argument("--backend", help="memory, sqlite або duckdb (інакше FISHLOG_BACKEND)")
+    parser.add_argument("--database", help="файл бази для sqlite/duckdb")
+    parser.add_argument("--verbose", action="store_true", help="журнал кожного запиту")
+    args = parser.parse_args(argv)
+    serve(args.path, args.host, args.port, args.workers, args.backend, args.database, args.verbose)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+from fishlog.framecache import per_frame
+
+# Відносна похибка квантилів: значення відновлюється з точністю ±1%
+RELATIVE_ACCURACY = 0.01
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = np.log(_GAMMA)
+# Розрізи ескізів: вид загалом, вид на кожній базі, вид на кожній локації
+SKETCH_KEYS = {"fish": ["fish"], "base": ["fish", "base"], "location": ["fish", "location"]}
+TROPHY_QUANTILES = [0.9, 0.99]
+
+
+def bucket_of(weight):
+    # Логарифмічні кошики: кошик i містить ваги з (γ^(i-1), γ^i]
+    return np.ceil(np.log(np.maximum(np.asarray(weight, dtype=float), 1)) / _LOG_GAMMA).astype(np.int32)
+
+
+def bucket_value(bucket):
+    # Представник кошика з відносною похибкою не більше RELATIVE_ACCURACY
+    return 2 * _GAMMA ** np.asarray(bucket, dtype=float) / (_GAMMA + 1)
+
+
+class WeightSketch:
+    # Ескіз розподілу ваги для кожної групи (виду, виду на базі тощо) у стилі DDSketch:
+    # кількість уловів у логарифмічних кошиках ваги. Ескізи частин даних (фрагментів,
+    # дописаних рядків, різних файлів) зливаються додаванням лічильників, а квантиль
+    # знаходиться за накопиченою сумою кошиків, без сортування уловів
+    def __init__(self, keys, counts):
+        self.keys = list(keys)
+        self.counts = counts
+
+    @classmethod
+    def from_frame(cls, df, keys=("fish",)):
+        # Як і в species_max_weights, записи з id > 9999 не враховуються. Записи з порожнім
+        # значенням ключа (код -1) не належать жодній групі — threshold_flags дає їм поріг NaN
+        keep = df["id"].to_numpy() <= 9999
+        for key in keys:
+            keep &= df[key].cat.codes.to_numpy() >= 0
+        df = df[keep]
+        # Групи й кошики зводяться в один цілий ключ, а лічильники — через np.unique за ключем
+        codes = [df[key].cat.codes.to_numpy().astype(np.int64) for key in keys]
+        buckets = bucket_of(df["weight"].to_numpy()).astype(np.int64)
+        shape = [len(df[key].cat.categories) for key in keys] + [int(buckets.max(initial=0)) + 1]
+        composite, counts = np.unique(np.ravel_multi_index(codes + [buckets], shape), return_counts=True)
+        parts = np.unravel_index(composite, shape)
+        index = pd.MultiIndex.from_arrays(
+            [np.asarray(df[key].cat.categories, dtype=object)[part] for key, part in zip(keys, parts)] + [parts[-1]],
+            names=list(keys) + ["bucket"])
+        counts = pd.Series(counts.astype(np.int64), index=index)
+        return cls(keys, counts)
+
+    def merge(self, other):
+        if not len(other.counts):
+            return self
+        if not len(self.counts):
+            return other
+        counts = pd.concat([self.counts, other.counts]).groupby(level=list(range(len(self.keys) + 1))).sum()
+        return WeightSketch(self.keys, counts)
+
+    def quantiles(self, quantiles=TROPHY_QUANTILES):
+        # DataFrame: для кожної групи кількість уловів і вага на кожному квантилі
+        counts = self.counts.sort_index()
+        groups = counts.groupby(level=self.keys)
+        cumulative = groups.cumsum().to_numpy()
+        totals = groups.transform("sum").to_numpy()
+        buckets = counts.index.get_level_values("bucket").to_numpy()
+        group_index = counts.index.droplevel("bucket")
+        result = {"count": groups.sum()}
+        for q in quantiles:
+            # Перший кошик, де накопичено не менше q·n уловів (ранг як у numpy "lower")
+            reached = cumulative > np.floor(q * (totals - 1))
+            first = pd.Series(np.where(reached, buckets, np.iinfo(np.int32).max), index=group_index) \
+                .groupby(level=self.keys).min()
+            result[f"p{round(q * 100):g}"] = np.rint(bucket_value(first.to_numpy()))
+        frame = pd.DataFrame(result)
+        frame["count"] = frame["count"].astype(np.int64)
+        return frame
+
+    def thresholds(self, quantile):
+        # Поріг ваги кожної групи на заданому квантилі
+        return self.quantiles([quantile]).iloc[:, 1]
+
+
+class SketchSet:
+    # Ескізи для всіх розрізів SKETCH_KEYS, що зливаються разом
+    def __init__(self, sketches):
+        self.sketches = sketches
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls({name: WeightSketch.from_frame(df, keys) for name, keys in SKETCH_KEYS.items()})
+
+    def merge(self, other):
+        return SketchSet({name: sketch.merge(other.sketches[name]) for name, sketch in self.sketches.items()})
+
+    def __getitem__(self, name):
+        return self.sketches[name]
+
+
+# Ескізи будуються один раз для кожного завантаженого DataFrame (або кладуться готовими
+# з інкрементального розбору через frame_sketches.store)
+frame_sketches = per_frame(SketchSet.from_frame)
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+from collections import namedtuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Знімок розібраного журналу лежить поруч із файлом: Fishlog.txt.snapshot/
+SNAPSHOT_SUFFIX = ".snapshot"
+SNAPSHOT_VERSION = 5
+# Після стількох дописаних частин знімок переписується одним файлом
+MAX_PARTS = 32
+
+_META_NAME = "_meta.json"
+_QUARANTINE_NAME = "quarantine.parquet"
+_SIGNATURE_SIZE = 256
+
+Snapshot = namedtuple("Snapshot", ["df", "offset", "lines", "quarantine"])
+
+
+def snapshot_dir(path):
+    return os.path.abspath(path) + SNAPSHOT_SUFFIX
+
+
+def _signature(path, offset):
+    # Хеші початку файлу і останніх байтів перед offset: якщо вони збігаються,
+    # вважаємо, що вже розібрана частина тексту не змінилася
+    with open(path, "rb") as fh:
+        head = fh.read(min(offset, _SIGNATURE_SIZE))
+        fh.seek(max(offset - _SIGNATURE_SIZE, 0))
+        tail = fh.read(min(offset, _SIGNATURE_SIZE))
+    return hashlib.sha1(head).hexdigest(), hashlib.sha1(tail).hexdigest()
+
+
+def _read_meta(directory):
+    try:
+        with open(os.path.join(directory, _META_NAME), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(directory, meta):
+    tmp = os.path.join(directory, _META_NAME + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(meta, fh)
+    os.replace(tmp, os.path.join(directory, _META_NAME))
+
+
+def _write_part(directory, df, index):
+    name = f"part-{index:05d}.parquet"
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(table, os.path.join(directory, name))
+    return name
+
+
+def _write_quarantine(directory, quarantine):
+    # Відхилені рядки зберігаються цілим файлом: їх зазвичай мало
+    target = os.path.join(directory, _QUARANTINE_NAME)
+    if quarantine is None or not len(quarantine):
+        if os.path.exists(target):
+            os.remove(target)
+        return 0
+    pq.write_table(pa.Table.from_pandas(quarantine, preserve_index=False), target)
+    return len(quarantine)
+
+
+def read_snapshot(path, tag=None):
+    # Повертає Snapshot(df, offset, lines, quarantine) або None, якщо знімка немає чи він застарів.
+    # tag — відбиток налаштувань розбору (напр. таблиці наживок), з якими знімок створено
+    directory = snapshot_dir(path)
+    meta = _read_meta(directory)
+    if meta is None or meta.get("version") != SNAPSHOT_VERSION or meta.get("tag") != tag or not meta["parts"]:
+        return None
+    offset = meta["offset"]
+    try:
+        if os.path.getsize(path) < offset:
+            return None
+        if list(_signature(path, offset)) != [meta["head"], meta["tail"]]:
+            return None
+        tables = [pq.read_table(os.path.join(directory, name), memory_map=True) for name in meta["parts"]]
+        quarantine = pq.read_table(os.path.join(directory, _QUARANTINE_NAME)).to_pandas() if meta["rejected"] else None
+    except (OSError, pa.ArrowException):
+        return None
+    return Snapshot(pa.concat_tables(tables).to_pandas(), offset, meta["lines"], quarantine)
+
+
+def write_snapshot(path, df, offset, tag=None, lines=0, quarantine=None):
+    # Повний перезапис знімка (перший розбір, заміна файлу або ущільнення частин)
+    directory = snapshot_dir(path)
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith(".parquet"):
+            os.remove(os.path.join(directory, name))
+    head, tail = _signature(path, offset)
+    parts = [_write_part(directory, df, 0)] if len(df) else []
+    rejected = _write_quarantine(directory, quarantine)
+    _write_meta(directory, {"version": SNAPSHOT_VERSION, "tag": tag, "offset": offset,
+                            "head": head, "tail": tail, "parts": parts,
+                            "lines": lines, "rejected": rejected})
+
+
+def append_snapshot(path, new_df, offset, full_df=None, tag=None, lines=0, quarantine=None, previous_offset=None):
+    # Дописуємо лише нові рядки окремою частиною; якщо частин забагато — переписуємо все.
+    # previous_offset — звідки дочитано new_df. Частина дописується, лише якщо знімок закінчується
+    # саме там: інакше той самий хвіст уже дописав інший спостерігач того ж журналу (або знімок
+    # іншої версії файлу), і повторне дописування задвоїло б рядки
+    directory = snapshot_dir(path)
+    meta = _read_meta(directory)
+    if meta is not None and meta.get("tag") == tag and meta["offset"] == offset \
+            and list(_signature(path, offset)) == [meta["head"], meta["tail"]]:
+        return
+    if meta is None or meta.get("tag") != tag or meta["offset"] != previous_offset \
+            or list(_signature(path, previous_offset)) != [meta["head"], meta["tail"]] \
+            or (full_df is not None and len(meta["parts"]) >= MAX_PARTS):
+        if full_df is not None:
+            write_snapshot(path, full_df, offset, tag=tag, lines=lines, quarantine=quarantine)
+        return
+    if len(new_df):
+        meta["parts"].append(_write_part(directory, new_df, len(meta["parts"])))
+    if quarantine is not None and len(quarantine) != meta["rejected"]:
+        meta["rejected"] = _write_quarantine(directory, quarantine)
+    meta["lines"] = lines
+    meta["head"], meta["tail"] = _signature(path, offset)
+    meta["offset"] = offset
+    _write_meta(directory, meta)
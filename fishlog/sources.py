@@ -0,0 +1,120 @@
+import glob
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+from fishlog.arrow_engine import concat_quarantine
+from fishlog.loader import cached_frame, parse_fishlog_bytes, store_frame, with_quarantine
+from fishlog.schema import COLUMN_NAMES, SOURCE_COLUMN, concat_frames
+
+# Файли, які беремо з каталогу журналів (включно з підкаталогами гравців)
+SOURCE_PATTERN = "**/*.txt"
+
+
+def resolve_sources(spec):
+    # Файл, каталог (усі *.txt у ньому) або glob-шаблон -> впорядкований список файлів
+    if os.path.isdir(spec):
+        paths = glob.glob(os.path.join(spec, SOURCE_PATTERN), recursive=True)
+    elif glob.has_magic(spec):
+        paths = glob.glob(spec, recursive=True)
+    else:
+        paths = [spec]
+    paths = sorted(os.path.abspath(path) for path in paths if os.path.isfile(path))
+    if not paths:
+        raise FileNotFoundError(f"Не знайдено файлів журналу: {spec}")
+    return paths
+
+
+def source_names(paths):
+    # Назва джерела — шлях відносно спільного каталогу (player1/Fishlog.txt, session2.txt)
+    if len(paths) == 1:
+        return [os.path.basename(paths[0])]
+    root = os.path.commonpath([os.path.dirname(path) for path in paths])
+    return [os.path.relpath(path, root).replace(os.sep, "/") for path in paths]
+
+
+def unique_names(names):
+    # Однакові назви файлів різних гравців розрізняються номером: Fishlog.txt, Fishlog.txt (2)
+    seen = {}
+    result = []
+    for name in names:
+        seen[name] = seen.get(name, 0) + 1
+        result.append(name if seen[name] == 1 else f"{name} ({seen[name]})")
+    return result
+
+
+def tag_source(df, quarantine, name):
+    # Категорія з одним значенням: стовпець джерела займає 1 байт на рядок
+    codes = np.zeros(len(df), dtype=np.int8)
+    df[SOURCE_COLUMN] = pd.Categorical.from_codes(codes, categories=[name])
+    quarantine.insert(0, SOURCE_COLUMN, name)
+    return df, quarantine
+
+
+def parse_source(name, data, first_line=1):
+    # Виконується в окремому процесі: повертає розібрані рядки й карантин, позначені джерелом
+    # (name=None — одиночний файл без стовпця source)
+    if isinstance(data, str):
+        with open(data, "rb") as fh:
+            data = fh.read()
+    df, quarantine = parse_fishlog_bytes(data, first_line=first_line)
+    if name is None:
+        return df, quarantine
+    return tag_source(df, quarantine, name)
+
+
+def map_sources(tasks, workers=None):
+    # Розбирає завдання (назва, дані або шлях, номер першого рядка) у пулі процесів;
+    # результати повертаються в порядку завдань, у роботі одночасно не більше 2 × workers.
+    # Пул — spawn, бо поруч працюють потоки Streamlit і pyarrow, а fork процесу з потоками небезпечний
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        yield from (parse_source(*task) for task in tasks)
+        return
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(parse_source, *task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def dedupe_sources(df):
+    # Журнали різних гравців і сесій можуть перекриватися. Запис вважається повтором,
+    # якщо такий самий рядок уже є в іншому джерелі: k-те входження рядка в одному джерелі
+    # відповідає k-тому в іншому, тож справжні однакові улови в межах журналу зберігаються
+    if SOURCE_COLUMN not in df.columns or df[SOURCE_COLUMN].nunique() < 2:
+        return df
+    record = pd.util.hash_pandas_object(df[COLUMN_NAMES], index=False).to_numpy()
+    occurrence = pd.DataFrame({"source": df[SOURCE_COLUMN].cat.codes.to_numpy(), "record": record}) \
+        .groupby(["source", "record"], sort=False).cumcount().to_numpy()
+    duplicated = pd.DataFrame({"record": record, "occurrence": occurrence}).duplicated().to_numpy()
+    if not duplicated.any():
+        return df
+    return df[~duplicated].reset_index(drop=True)
+
+
+def merge_sources(parts):
+    # parts — пари (df, quarantine) окремих джерел або їхніх фрагментів
+    df = dedupe_sources(concat_frames([df for df, _ in parts]))
+    return with_quarantine(df, concat_quarantine([quarantine for _, quarantine in parts]))
+
+
+def load_sources(spec, workers=None):
+    # Каталог, glob-шаблон або список файлів журналу -> один DataFrame зі стовпцем source.
+    # Файли розбираються паралельно; поки жоден файл не змінився, повторного розбору немає
+    paths = resolve_sources(spec) if isinstance(spec, str) else sorted(os.path.abspath(path) for path in spec)
+    stats = [os.stat(path) for path in paths]
+    key = ("sources",) + tuple((path, stat.st_mtime_ns, stat.st_size) for path, stat in zip(paths, stats))
+    df = cached_frame(key)
+    if df is None:
+        tasks = [(name, path) for name, path in zip(source_names(paths), paths)]
+        workers = min(workers or os.cpu_count() or 1, len(tasks))
+        df = store_frame(key, merge_sources(list(map_sources(tasks, workers))))
+    return df
@@ -0,0 +1,347 @@
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from fishlog.aggregate import DEPTH_LABELS, GROUP_COLUMNS, MEASURES, Aggregates, depth_bin_codes
+from fishlog.arrow_engine import empty_quarantine
+from fishlog.baits import BAIT_TAXONOMY
+from fishlog.index import ALL, normalize_query
+from fishlog.loader import parse_fishlog_bytes
+from fishlog.records import record_flags
+from fishlog.schema import COLUMN_NAMES, SOURCE_COLUMN, apply_schema, empty_frame, format_time
+from fishlog.sources import resolve_sources, source_names
+
+# Скільки байтів журналу розбирається і записується в базу за один раз
+CHUNK_BYTES = 8 * 1024 * 1024
+# Стовпці таблиці уловів: запис журналу, тип наживки, джерело, година, діапазон глибини
+# і позначка повтору рядка з іншого джерела
+TABLE_COLUMNS = COLUMN_NAMES + ["bait_type", SOURCE_COLUMN, "hour", "depth_bin", "dup"]
+RECORD_COLUMNS = COLUMN_NAMES + ["bait_type"]
+# Версія вмісту таблиць: зі зміною версії (як і таблиці наживок) база перебудовується
+STORE_VERSION = 2
+
+_HEAD_SIZE = 256
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS catches (fish TEXT, weight INTEGER, bait TEXT, base TEXT, location TEXT, "
+    "id INTEGER, time INTEGER, depth INTEGER, bait_type TEXT, source TEXT, hour INTEGER, depth_bin INTEGER, "
+    "dup INTEGER)",
+    "CREATE TABLE IF NOT EXISTS sources (source TEXT PRIMARY KEY, path TEXT, parsed_bytes BIGINT, "
+    "lines BIGINT, head BLOB, ino BIGINT)",
+    "CREATE TABLE IF NOT EXISTS quarantine (source TEXT, line BIGINT, reason TEXT, text TEXT)",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+]
+
+# Записи, що повторюють рядок з раніше впорядкованого джерела (k-те входження рядка
+# в одному джерелі відповідає k-тому в іншому — як у dedupe_sources)
+_MARK_DUPLICATES = """
+UPDATE catches SET dup = 1 WHERE rowid IN (
+    SELECT r FROM (
+        SELECT r, ROW_NUMBER() OVER (PARTITION BY fish, weight, bait, base, location, id, time, depth, k
+                                     ORDER BY source, r) AS n
+        FROM (
+            SELECT rowid AS r, source, fish, weight, bait, base, location, id, time, depth,
+                   ROW_NUMBER() OVER (PARTITION BY source, fish, weight, bait, base, location, id, time, depth
+                                      ORDER BY rowid) AS k
+            FROM catches
+        ) AS numbered
+    ) AS ranked
+    WHERE n > 1
+)
+"""
+
+
+class SqliteDialect:
+    name = "sqlite"
+    suffix = ".sqlite"
+    indexes = [
+        "CREATE INDEX IF NOT EXISTS catches_weight ON catches (weight)",
+        "CREATE INDEX IF NOT EXISTS catches_source ON catches (source)",
+        "CREATE INDEX IF NOT EXISTS catches_fish ON catches (fish)",
+        "CREATE INDEX IF NOT EXISTS catches_base ON catches (base)",
+    ]
+
+    @staticmethod
+    def connect(path):
+        # Транзакції відкриваються явно (BEGIN/COMMIT), як і в DuckDB
+        connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    @staticmethod
+    def insert(connection, table, df):
+        placeholders = ", ".join("?" * len(df.columns))
+        rows = zip(*[df[column].tolist() for column in df.columns])
+        connection.executemany(f"INSERT INTO {table} ({', '.join(df.columns)}) VALUES ({placeholders})", rows)
+
+
+class DuckdbDialect:
+    # Стовпчикова база: індекси не потрібні, вставка — одним INSERT ... SELECT з DataFrame
+    name = "duckdb"
+    suffix = ".duckdb"
+    indexes = []
+
+    @staticmethod
+    def connect(path):
+        try:
+            import duckdb
+        except ImportError:
+            raise ImportError("Для бекенда duckdb встановіть пакет duckdb (pip install duckdb)") from None
+        return duckdb.connect(path)
+
+    @staticmethod
+    def insert(connection, table, df):
+        connection.register("_frame", df)
+        try:
+            connection.execute(f"INSERT INTO {table} ({', '.join(df.columns)}) SELECT * FROM _frame")
+        finally:
+            connection.unregister("_frame")
+
+
+DIALECTS = {dialect.name: dialect for dialect in (SqliteDialect, DuckdbDialect)}
+
+
+def default_database(paths, suffix):
+    # База лежить поруч із журналом (Fishlog.txt.sqlite) або в спільному каталозі журналів
+    if len(paths) == 1:
+        return paths[0] + suffix
+    return os.path.join(os.path.commonpath([os.path.dirname(path) for path in paths]), "fishlog" + suffix)
+
+
+def _text(values):
+    # Порожнє значення виміру (NaN у категорії) — NULL, а не рядок "nan"
+    return values.astype(object).where(values.notna(), None)
+
+
+def table_frame(df, source):
+    # Розібрані рядки у вигляді стовпців таблиці catches
+    frame = pd.DataFrame({column: _text(df[column]) if column in ("fish", "bait", "base", "location")
+                          else df[column].astype(np.int64) for column in COLUMN_NAMES})
+    frame["bait_type"] = _text(df["bait_type"])
+    frame[SOURCE_COLUMN] = source
+    frame["hour"] = (df["time"] // 60).astype(np.int64)
+    frame["depth_bin"] = depth_bin_codes(df["depth"]).astype(np.int64)
+    frame["dup"] = np.zeros(len(df), dtype=np.int64)
+    return frame
+
+
+class SqlBackend:
+    # Дані журналу в базі на диску: фільтри, зведення, години, діапазони глибини і топ наживок
+    # рахуються SQL-запитами, у pandas потрапляють лише результати. Ті самі методи, що й у
+    # MemoryBackend, тож інтерфейс не залежить від того, де лежать дані.
+    # Змінені журнали дочитуються з місця, де зупинився попередній розбір
+    def __init__(self, spec, dialect=SqliteDialect, database=None):
+        self.spec = spec
+        self.dialect = dialect
+        self.database = database or default_database(resolve_sources(spec), dialect.suffix)
+        self.version = 0
+        self._sources = []
+        self._cache = {}
+        self._lock = threading.RLock()
+        self._connection = dialect.connect(self.database)
+        for statement in _SCHEMA + dialect.indexes:
+            self._connection.execute(statement)
+
+    def _fetch(self, sql, params=()):
+        with self._lock:
+            cursor = self._connection.execute(sql, list(params))
+            rows = cursor.fetchall()
+            return pd.DataFrame.from_records(rows, columns=[column[0] for column in cursor.description])
+
+    def _scalar(self, sql, params=()):
+        with self._lock:
+            row = self._connection.execute(sql, list(params)).fetchone()
+            return None if row is None else row[0]
+
+    def _cached(self, key, compute):
+        # Результати, що залежать лише від вмісту бази (список значень, максимуми видів)
+        with self._lock:
+            key = (self.version, key)
+            if key not in self._cache:
+                self._cache = {cached: value for cached, value in self._cache.items() if cached[0] == self.version}
+                self._cache[key] = compute()
+            return self._cache[key]
+
+    def sync(self):
+        # Приводить базу у відповідність до файлів журналу; повертає True, якщо дані змінилися
+        with self._lock:
+            connection = self._connection
+            changed = False
+            tag = f"{STORE_VERSION}:{BAIT_TAXONOMY.fingerprint}"
+            if self._scalar("SELECT value FROM meta WHERE key = 'taxonomy'") != tag:
+                # Таблиця наживок або формат бази змінилися — вміст застарів, розбираємо все заново
+                connection.execute("BEGIN")
+                for table in ("catches", "sources", "quarantine", "meta"):
+                    connection.execute(f"DELETE FROM {table}")
+                connection.execute("INSERT INTO meta VALUES ('taxonomy', ?)", [tag])
+                connection.execute("COMMIT")
+            paths = resolve_sources(self.spec)
+            names = source_names(paths)
+            known = {row.source: row for row in self._fetch("SELECT * FROM sources").itertuples()}
+            for name in set(known) - set(names):
+                self._forget(name)
+                changed = True
+            for name, path in zip(names, paths):
+                state = known.get(name)
+                stat = os.stat(path)
+                if state is not None and self._replaced(state, path, stat):
+                    self._forget(name)
+                    state = None
+                    changed = True
+                parsed_bytes = 0 if state is None else state.parsed_bytes
+                if state is None or stat.st_size > parsed_bytes:
+                    changed |= self._ingest(name, path, stat, state)
+            if changed:
+                connection.execute("BEGIN")
+                connection.execute("UPDATE catches SET dup = 0 WHERE dup <> 0")
+                if len(names) > 1:
+                    connection.execute(_MARK_DUPLICATES)
+                connection.execute("COMMIT")
+            if changed or self._sources != names:
+                self._sources = names
+                self.version += 1
+            return changed
+
+    @staticmethod
+    def _replaced(state, path, stat):
+        # Файл скорочено або замінено іншим — дописаним його вважати не можна
+        if stat.st_size < state.parsed_bytes or stat.st_ino != state.ino:
+            return True
+        with open(path, "rb") as fh:
+            return fh.read(len(state.head)) != bytes(state.head)
+
+    def _forget(self, name):
+        connection = self._connection
+        connection.execute("BEGIN")
+        for table in ("catches", "quarantine", "sources"):
+            connection.execute(f"DELETE FROM {table} WHERE source = ?", [name])
+        connection.execute("COMMIT")
+
+    def _ingest(self, name, path, stat, state):
+        # Розбір файлу від збереженого зміщення фрагментами: у пам'яті лише один фрагмент.
+        # Незавершений останній рядок лишається до наступної синхронізації
+        parsed_bytes = 0 if state is None else state.parsed_bytes
+        lines = 0 if state is None else state.lines
+        connection = self._connection
+        connection.execute("BEGIN")
+        try:
+            with open(path, "rb") as fh:
+                fh.seek(parsed_bytes)
+                rest = b""
+                while True:
+                    block = fh.read(CHUNK_BYTES)
+                    if not block:
+                        break
+                    data = rest + block
+                    end = data.rfind(b"\n") + 1
+                    rest = data[end:]
+                    if end == 0:
+                        continue
+                    chunk = data[:end]
+                    df, quarantine = parse_fishlog_bytes(chunk, first_line=lines + 1)
+                    if len(df):
+                        self.dialect.insert(connection, "catches", table_frame(df, name))
+                    if len(quarantine):
+                        self.dialect.insert(connection, "quarantine", quarantine.assign(source=name)[
+                            ["source", "line", "reason", "text"]])
+                    lines += chunk.count(b"\n")
+                    parsed_bytes += end
+                fh.seek(0)
+                head = fh.read(min(parsed_bytes, _HEAD_SIZE))
+            connection.execute("DELETE FROM sources WHERE source = ?", [name])
+            connection.execute("INSERT INTO sources VALUES (?, ?, ?, ?, ?, ?)",
+                               [name, path, parsed_bytes, lines, head, stat.st_ino])
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return state is None or parsed_bytes > state.parsed_bytes
+
+    @property
+    def columns(self):
+        # Стовпець source показується лише для кількох журналів
+        return RECORD_COLUMNS + ([SOURCE_COLUMN] if len(self._sources) > 1 else [])
+
+    def values(self, column):
+        return self._cached(("values", column), lambda: self._fetch(
+            f"SELECT DISTINCT {column} FROM catches WHERE dup = 0 AND {column} IS NOT NULL ORDER BY {column}"
+        )[column].tolist())
+
+    def quarantine(self):
+        def load():
+            quarantine = self._fetch("SELECT source, line, reason, text FROM quarantine ORDER BY source, line")
+            if not len(quarantine):
+                return empty_quarantine()
+            return quarantine if SOURCE_COLUMN in self.columns else quarantine.drop(columns=SOURCE_COLUMN)
+        return self._cached("quarantine", load)
+
+    def max_weights(self):
+        return self._cached("max_weights", lambda: dict(self._fetch(
+            "SELECT fish, MAX(weight) AS weight FROM catches WHERE dup = 0 AND id <= 9999 GROUP BY fish"
+        ).itertuples(index=False, name=None)))
+
+    @staticmethod
+    def _where(query):
+        key = normalize_query(**query)
+        clauses, params = ["dup = 0"], []
+        for column in ("base", "fish", "location", "bait", SOURCE_COLUMN):
+            value = getattr(key, column)
+            if value not in (None, ALL):
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if key.bait_types is not None:
+            if key.bait_types:
+                clauses.append(f"bait_type IN ({', '.join('?' * len(key.bait_types))})")
+                params.extend(sorted(key.bait_types))
+            else:
+                clauses.append("1 = 0")
+        if key.min_weight is not None:
+            clauses.append("weight > ?" if key.strict else "weight >= ?")
+            params.append(key.min_weight)
+        return " AND ".join(clauses), params
+
+    def count(self, **query):
+        where, params = self._where(query)
+        return int(self._scalar(f"SELECT COUNT(*) FROM catches WHERE {where}", params))
+
+    def aggregates(self, **query):
+        # Кожна панель — окремий GROUP BY у базі; у pandas лише згруповані рядки
+        where, params = self._where(query)
+        measures = ("COUNT(*) AS count, SUM(weight) AS weight_sum, MIN(weight) AS weight_min, "
+                    "MAX(weight) AS weight_max, SUM(depth) AS depth_sum, MIN(depth) AS depth_min, "
+                    "MAX(depth) AS depth_max")
+        groups = {}
+        for column in GROUP_COLUMNS:
+            # Як і в Aggregates.from_cells, записи з порожнім значенням окремої групи не утворюють
+            g = self._fetch(f"SELECT {column}, {measures} FROM catches WHERE {where} AND {column} IS NOT NULL "
+                            f"GROUP BY {column}", params)
+            groups[column] = g.set_index(column)[MEASURES].astype(np.int64)
+        hourly = self._fetch(f"SELECT hour, COUNT(*) AS count, SUM(weight) AS weight_sum FROM catches "
+                             f"WHERE {where} GROUP BY hour ORDER BY hour", params)
+        hourly = hourly.set_index("hour").astype(np.int64)
+        depth = self._fetch(f"SELECT depth_bin, COUNT(*) AS count FROM catches "
+                            f"WHERE {where} AND depth_bin >= 0 GROUP BY depth_bin", params)
+        counts = np.zeros(len(DEPTH_LABELS), dtype=np.int64)
+        counts[depth["depth_bin"].to_numpy(dtype=np.int64)] = depth["count"].to_numpy(dtype=np.int64)
+        return Aggregates(groups, hourly, pd.Series(counts, index=DEPTH_LABELS, name="count"))
+
+    def records(self, page, page_size, **query):
+        # Одна сторінка записів за спаданням ваги (як take_page) та їхні позначки
+        where, params = self._where(query)
+        columns = ", ".join(self.columns)
+        records = self._fetch(f"SELECT {columns} FROM catches WHERE {where} ORDER BY weight DESC, rowid "
+                              f"LIMIT ? OFFSET ?", params + [page_size, (page - 1) * page_size])
+        if records.empty:
+            # Без рядків sqlite не повідомляє типів — беремо порожній кадр зі схемою
+            records = empty_frame().assign(**{SOURCE_COLUMN: pd.Categorical([])})[self.columns]
+            return records.assign(time=format_time(records["time"])), np.zeros(0, dtype=np.int8)
+        records = apply_schema(records)
+        flags = record_flags(records, self.max_weights())
+        return records.assign(time=format_time(records["time"])), flags
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
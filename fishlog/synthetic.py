@@ -0,0 +1,93 @@
+import csv
+import os
+
+import numpy as np
+import pandas as pd
+
+from fishlog.loader import load_fishlog
+from fishlog.schema import COLUMN_NAMES
+
+# Зразок, з якого беруться назви риб, наживок, баз і локацій та їхні розподіли
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Fishlog.txt")
+# Скільки рядків генерується і записується за один раз
+CHUNK_LINES = 1_000_000
+# Розкид ваги відносно ваги зі зразка (логнормальний множник)
+WEIGHT_SIGMA = 0.25
+# Розкид глибини в метрах навколо глибини зі зразка
+DEPTH_JITTER = 15
+
+# Рядок "H-M" для кожної хвилини доби — такий самий запис часу, як у грі
+_TIME_TEXT = [f"{minute // 60}-{minute % 60}" for minute in range(24 * 60)]
+# Типи зіпсованих рядків: обрізаний рядок, нечислова вага, неможливий час
+_BAD_KINDS = 3
+
+
+class SyntheticLog:
+    # Генератор правдоподібних рядків Fishlog.txt. Риба, наживка, база, локація та id беруться
+    # разом з випадкового рядка зразка (тож поєднання реальні), вага — вага зразка з
+    # логнормальним розкидом, глибина — глибина зразка з невеликим зсувом, час — з розподілу годин
+    def __init__(self, sample):
+        self.sample = sample.reset_index(drop=True)
+        self._time_codes = self.sample["time"].to_numpy()
+        hours = np.bincount(self._time_codes // 60, minlength=24).astype(float)
+        self._hour_p = hours / hours.sum()
+
+    @classmethod
+    def from_file(cls, path=SAMPLE_PATH):
+        return cls(load_fishlog(path))
+
+    def frame(self, n, rng):
+        # n рядків у вигляді стовпців журналу (час — текст "H-M")
+        rows = rng.integers(0, len(self.sample), n)
+        picked = self.sample.take(rows)
+        weight = np.maximum(np.rint(picked["weight"].to_numpy() * rng.lognormal(0, WEIGHT_SIGMA, n)), 1)
+        depth = np.clip(picked["depth"].to_numpy() + rng.integers(-DEPTH_JITTER, DEPTH_JITTER + 1, n), 0, None)
+        hours = rng.choice(24, size=n, p=self._hour_p)
+        minutes = hours * 60 + rng.integers(0, 6, n) * 10
+        return pd.DataFrame({
+            "fish": picked["fish"].to_numpy(),
+            "weight": weight.astype(np.int64),
+            "bait": picked["bait"].to_numpy(),
+            "base": picked["base"].to_numpy(),
+            "location": picked["location"].to_numpy(),
+            "id": picked["id"].to_numpy(),
+            "time": pd.Categorical.from_codes(minutes, categories=_TIME_TEXT),
+            "depth": depth.astype(np.int64),
+        })[COLUMN_NAMES]
+
+    def lines(self, n, seed=0, bad_share=0.0, chunk_lines=CHUNK_LINES):
+        # Байти журналу фрагментами по chunk_lines рядків; bad_share — частка зіпсованих рядків
+        rng = np.random.default_rng(seed)
+        for start in range(0, n, chunk_lines):
+            count = min(chunk_lines, n - start)
+            df = self.frame(count, rng)
+            text = df.to_csv(sep=":", header=False, index=False, quoting=csv.QUOTE_NONE, lineterminator="\n")
+            if bad_share:
+                yield _corrupt(text, bad_share, rng)
+            else:
+                yield text.encode("utf-8")
+
+
+def _corrupt(text, bad_share, rng):
+    lines = text.split("\n")[:-1]
+    for position in np.flatnonzero(rng.random(len(lines)) < bad_share):
+        fields = lines[position].split(":")
+        kind = rng.integers(_BAD_KINDS)
+        if kind == 0:
+            lines[position] = ":".join(fields[:rng.integers(1, len(fields))])
+        elif kind == 1:
+            lines[position] = ":".join([fields[0], "x" + fields[1]] + fields[2:])
+        else:
+            lines[position] = ":".join(fields[:6] + ["25-99", fields[7]])
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def write_fishlog(path, n, seed=0, bad_share=0.0, sample=None):
+    # Записує синтетичний журнал з n рядків; повертає шлях
+    generator = SyntheticLog.from_file() if sample is None else SyntheticLog(sample)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as fh:
+        for chunk in generator.lines(n, seed=seed, bad_share=bad_share):
+            fh.write(chunk)
+    os.replace(tmp, path)
+    return path
@@ -1,5 +1,22 @@
 import flet as ft
-import pandas as pd
+
+from fishlog import open_backend, page_count
+
+# Скільки записів показує одна сторінка таблиці
+RECORDS_PAGE_SIZE = 50
+# Колір тексту запису за позначкою: звичайний, трофей (синій), id > 9999 (червоний)
+RECORD_COLORS = [None, "blue", "red"]
+
+
+def table_rows(columns, colors=None):
+    # Рядки DataTable з масивів стовпців, без iterrows і str() для кожної комірки
+    values = [column.astype(str).tolist() for column in columns]
+    colors = colors if colors is not None else [None] * len(values[0])
+    return [
+        ft.DataRow(cells=[ft.DataCell(ft.Text(value, color=color)) for value in row])
+        for row, color in zip(zip(*values), colors)
+    ]
+
 
 def main(page: ft.Page):
     page.title = "Fishlog Data"
@@ -14,6 +31,34 @@ def main(page: ft.Page):
     # Контейнер для таблиць
     tables_container = ft.Column()
 
+    # Поточний результат фільтрації: дані лишаються в пам'яті між натисканнями,
+    # а таблиця записів будується лише для видимої сторінки
+    state = {"backend": None, "query": None, "total": 0, "page": 1}
+    records_table = ft.DataTable(columns=[ft.DataColumn(ft.Text("-"))])
+    page_label = ft.Text()
+
+    def show_records_page():
+        pages = page_count(state["total"], RECORDS_PAGE_SIZE)
+        state["page"] = min(max(state["page"], 1), pages)
+        records, flags = state["backend"].records(state["page"], RECORDS_PAGE_SIZE, **state["query"])
+        records_table.columns = [ft.DataColumn(ft.Text(col)) for col in records.columns]
+        records_table.rows = table_rows([records[col] for col in records.columns],
+                                        [RECORD_COLORS[flag] for flag in flags])
+        page_label.value = f"Сторінка {state['page']} з {pages}"
+
+    def change_page(step):
+        def handler(e):
+            state["page"] += step
+            show_records_page()
+            page.update()
+        return handler
+
+    records_pager = ft.Row([
+        ft.TextButton("◀ Попередня", on_click=change_page(-1)),
+        page_label,
+        ft.TextButton("Наступна ▶", on_click=change_page(1)),
+    ])
+
     def update_tables(e):
         # Отримуємо значення з полів введення
         my_base = base_input.value if base_input.value.strip() else "Всі"
@@ -24,13 +69,10 @@ def main(page: ft.Page):
         except ValueError:
             my_weight = 0
 
-        # Завантаження даних з файлу
-        column_names = ["fish", "weight", "bait", "base", "location", "id", "time", "depth"]
+        # Завантаження даних з файлу (розбираються лише нові рядки, дописані грою);
+        # FISHLOG_BACKEND=sqlite чи duckdb тримає дані в базі на диску, http — запити до служби fishlog.service
         try:
-            base_df = pd.read_csv("Fishlog.txt", sep=":", names=column_names, header=None)
-            base_df["time"] = base_df["time"].str.replace("-", ":")
-            base_df["time"] = pd.to_datetime(base_df["time"], format="%H:%M")
-            base_df["time"] = base_df["time"].dt.strftime("%H:%M")
+            backend = open_backend("Fishlog.txt")
         except FileNotFoundError:
             tables_container.controls.clear()
             tables_container.controls.append(ft.Text("Помилка: Файл Fishlog.txt не знайдено"))
@@ -38,39 +80,24 @@ def main(page: ft.Page):
             return
 
         # Фільтруємо за базою, рибою, локацією та вагою
-        f = base_df.copy()  # Створюємо копію DataFrame
-        f = f[f['weight'] > my_weight]  # Фільтрація за вагою
-        if my_base not in (None, 'Всі'):
-            f = f[f['base'] == my_base]
-        if my_fish not in (None, 'Всі'):
-            f = f[f['fish'] == my_fish]
-        if my_location not in (None, 'Всі'):
-            f = f[f['location'] == my_location]
+        query = dict(base=my_base, fish=my_fish, location=my_location, min_weight=my_weight, strict=True)
+        total = backend.count(**query)
 
         # Очищаємо попередні таблиці
         tables_container.controls.clear()
+        quarantine = backend.quarantine()
+        if len(quarantine):
+            tables_container.controls.append(
+                ft.Text(f"Відхилено некоректних рядків: {len(quarantine)}", color="orange"))
 
         # Перевірка на порожній результат
-        if f.empty:
+        if total == 0:
             tables_container.controls.append(ft.Text("Немає даних для заданих критеріїв"))
         else:
             # Групуємо за наживкою
-            grouped_base = f.groupby(['bait']).agg(
-                mean_weight=('weight', 'mean'),
-                max_weight=('weight', 'max'),
-                fish_count=('weight', 'size'),
-                max_depth=('depth', 'max'),
-                min_depth=('depth', 'min'),
-            ).sort_values(by='bait', ascending=True)
-
-            # Округлюємо числові стовпці до цілих чисел
-            grouped_base['mean_weight'] = grouped_base['mean_weight'].astype(int)
-            grouped_base['max_weight'] = grouped_base['max_weight'].astype(int)
-            grouped_base['max_depth'] = grouped_base['max_depth'].astype(int)
-            grouped_base['min_depth'] = grouped_base['min_depth'].astype(int)
-
-            # Сортуємо f за вагою
-            f_sorted = f.sort_values(by='weight', ascending=False)
+            # (той самий куб, що й у Streamlit-версії, тож числа збігаються)
+            agg = backend.aggregates(**query)
+            grouped_base = agg.summary('bait')
 
             # Заголовок
             header = f'Зведення по базі {my_base if my_base not in (None, "Всі") else "всі бази"}, ' \
@@ -78,7 +105,7 @@ def main(page: ft.Page):
                      f'локації {my_location if my_location not in (None, "Всі") else "всі локації"}, ' \
                      f'вага > {my_weight}'
             tables_container.controls.append(ft.Text(header))
-            tables_container.controls.append(ft.Text(f'Всього записів: {len(f_sorted)}'))
+            tables_container.controls.append(ft.Text(f'Всього записів: {total}'))
 
             # Таблиця для grouped_base
             tables_container.controls.append(ft.Text("Зведена таблиця:"))
@@ -91,34 +118,23 @@ def main(page: ft.Page):
                     ft.DataColumn(ft.Text("Макс. глибина")),
                     ft.DataColumn(ft.Text("Мін. глибина")),
                 ],
-                rows=[
-                    ft.DataRow(cells=[
-                        ft.DataCell(ft.Text(str(index))),
-                        ft.DataCell(ft.Text(str(row['mean_weight']))),
-                        ft.DataCell(ft.Text(str(row['max_weight']))),
-                        ft.DataCell(ft.Text(str(row['fish_count']))),
-                        ft.DataCell(ft.Text(str(row['max_depth']))),
-                        ft.DataCell(ft.Text(str(row['min_depth']))),
-                    ])
-                    for index, row in grouped_base.iterrows()
-                ]
+                rows=table_rows([
+                    grouped_base.index,
+                    grouped_base['mean_weight'],
+                    grouped_base['max_weight'],
+                    grouped_base['fish_count'],
+                    grouped_base['max_depth'],
+                    grouped_base['min_depth'],
+                ])
             )
             tables_container.controls.append(grouped_table)
 
-            # Таблиця для f_sorted.head(20)
-            tables_container.controls.append(ft.Text("Перші 20 записів (відсортовані за вагою):"))
-            sorted_table = ft.DataTable(
-                columns=[
-                    ft.DataColumn(ft.Text(col)) for col in f_sorted.columns
-                ],
-                rows=[
-                    ft.DataRow(cells=[
-                        ft.DataCell(ft.Text(str(value))) for value in row
-                    ])
-                    for _, row in f_sorted.head(20).iterrows()
-                ]
-            )
-            tables_container.controls.append(sorted_table)
+            # Усі записи посторінково (відсортовані за вагою)
+            state.update(backend=backend, query=query, total=total, page=1)
+            show_records_page()
+            tables_container.controls.append(ft.Text("Усі записи (відсортовані за вагою):"))
+            tables_container.controls.append(records_pager)
+            tables_container.controls.append(records_table)
 
         # Оновлюємо сторінку
         page.update()
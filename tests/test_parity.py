@@ -0,0 +1,131 @@
+import itertools
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import fishlog.cube
+from fishlog.aggregate import DEPTH_BINS, DEPTH_LABELS, GROUP_COLUMNS, MEASURES
+from fishlog.backend import open_backend
+from fishlog.index import FilterIndex
+from fishlog.loader import parse_fishlog_bytes
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Fishlog.txt")
+MISSING = "Нема такої"
+# Рядки з порожньою рибою, базою, локацією та наживкою (код категорії -1)
+EMPTY_DIMENSION_LINES = [
+    ":557:Червь:Озеро:Облака над озером:1047:8-10:200\n",
+    "Плотва:612:Червь::Облака над озером:1048:9-15:210\n",
+    "Плотва:733:Червь:Озеро::1049:10-20:40\n",
+    "Плотва:845::Озеро:Облака над озером:1050:11-25:35\n",
+]
+
+
+def _sample_text(count=2000):
+    with open(SAMPLE_PATH, encoding="utf-8") as fh:
+        return "".join(EMPTY_DIMENSION_LINES) + "".join(next(fh) for _ in range(count))
+
+
+@pytest.fixture(scope="module")
+def sample_df():
+    df, _ = parse_fishlog_bytes(_sample_text().encode("utf-8"))
+    return df
+
+
+def _pandas_rows(df, base=None, fish=None, location=None, bait=None, min_weight=None, bait_types=None,
+                 strict=False):
+    # Еталон: звичайний булевий фільтр pandas
+    mask = pd.Series(True, index=df.index)
+    for column, value in (("base", base), ("fish", fish), ("location", location), ("bait", bait)):
+        if value is not None:
+            mask &= df[column] == value
+    if min_weight is not None:
+        mask &= df["weight"] > min_weight if strict else df["weight"] >= min_weight
+    if bait_types is not None:
+        mask &= df["bait_type"].isin(bait_types)
+    return np.flatnonzero(mask.to_numpy())
+
+
+def _pandas_aggregates(f):
+    measures = dict(count=("weight", "size"), weight_sum=("weight", "sum"), weight_min=("weight", "min"),
+                    weight_max=("weight", "max"), depth_sum=("depth", "sum"), depth_min=("depth", "min"),
+                    depth_max=("depth", "max"))
+    groups = {column: f.groupby(column, observed=True).agg(**measures)[MEASURES].astype(np.int64)
+              for column in GROUP_COLUMNS}
+    hourly = f.groupby(f["time"] // 60)["weight"].agg(["size", "sum"]).astype(np.int64)
+    depth = pd.cut(f["depth"], bins=DEPTH_BINS, labels=DEPTH_LABELS, right=False).value_counts().reindex(DEPTH_LABELS)
+    return groups, hourly.to_numpy(), hourly.index.to_numpy(), depth.to_numpy()
+
+
+def _assert_same_aggregates(agg, f):
+    groups, hourly, hours, depth = _pandas_aggregates(f)
+    for column in GROUP_COLUMNS:
+        expected = groups[column]
+        actual = agg.groups[column].loc[expected.index.astype(object)] if len(expected) else agg.groups[column]
+        assert len(agg.groups[column]) == len(expected)
+        np.testing.assert_array_equal(actual[MEASURES].to_numpy(dtype=np.int64), expected.to_numpy())
+    np.testing.assert_array_equal(agg.hourly.index.to_numpy(), hours)
+    np.testing.assert_array_equal(agg.hourly[["count", "weight_sum"]].to_numpy(), hourly)
+    np.testing.assert_array_equal(agg.depth.to_numpy(), depth)
+
+
+def _queries(df):
+    weights = df["weight"].to_numpy()
+    for base, fish, location, min_weight, bait_types in itertools.product(
+            [None, df["base"].dropna().iloc[0], MISSING],
+            [None, df["fish"].dropna().iloc[0]],
+            [None, df["location"].dropna().iloc[0]],
+            [None, 500, int(np.median(weights))],
+            [None, ["Біо", "Воблери"], []]):
+        yield dict(base=base, fish=fish, location=location, min_weight=min_weight, bait_types=bait_types)
+    # Значень, яких немає в даних, і порожніх збігів
+    yield dict(fish=MISSING)
+    yield dict(location=MISSING, min_weight=0)
+    yield dict(bait_types=["Нема такого типу"])
+    yield dict(min_weight=int(weights.max()) + 1)
+    # Поріг рівно на вазі наявних записів: >= і > мають відрізнятися
+    yield dict(min_weight=int(weights[4]), strict=True)
+    yield dict(min_weight=int(weights[4]))
+    yield dict(bait=df["bait"].dropna().iloc[0], min_weight=100)
+
+
+@pytest.mark.parametrize("max_share", [fishlog.cube.CUBE_MAX_SHARE, 1.0])
+def test_index_and_cube_match_pandas_filter(sample_df, monkeypatch, max_share):
+    # З max_share=1.0 куб тримається навіть на малому журналі, тож перевіряються обидва шляхи зведень
+    monkeypatch.setattr(fishlog.cube, "CUBE_MAX_SHARE", max_share)
+    df = sample_df.copy()
+    index = FilterIndex(df)
+    assert (len(fishlog.cube.frame_cube(df)) > 0) == (max_share == 1.0)
+    for query in _queries(df):
+        rows = index.query(**query)
+        expected = _pandas_rows(df, **query)
+        np.testing.assert_array_equal(np.sort(rows), expected, err_msg=str(query))
+        assert np.all(np.diff(df["weight"].to_numpy()[rows]) <= 0)
+        _assert_same_aggregates(fishlog.cube.query_aggregates(df, rows, **query), df.take(expected))
+
+
+def test_memory_and_sql_backends_match(sample_df, tmp_path):
+    # Ті самі фільтри (зокрема без жодного збігу) дають однакові кількості, зведення і сторінки записів
+    path = tmp_path / "Fishlog.txt"
+    path.write_text(_sample_text(), encoding="utf-8")
+    memory = open_backend(str(path), kind="memory")
+    sql = open_backend(str(path), kind="sqlite", database=str(tmp_path / "fishlog.db"))
+    try:
+        for query in _queries(sample_df):
+            assert memory.count(**query) == sql.count(**query), query
+            expected, actual = memory.aggregates(**query), sql.aggregates(**query)
+            for column in GROUP_COLUMNS:
+                pd.testing.assert_frame_equal(actual.groups[column][MEASURES].sort_index(),
+                                              expected.groups[column][MEASURES].sort_index(),
+                                              check_dtype=False, check_index_type=False, obj=str(query))
+            pd.testing.assert_frame_equal(actual.hourly, expected.hourly, check_dtype=False)
+            pd.testing.assert_series_equal(actual.depth, expected.depth, check_dtype=False)
+
+            (memory_page, memory_flags), (sql_page, sql_flags) = (memory.records(1, 50, **query),
+                                                                  sql.records(1, 50, **query))
+            assert list(sql_page.columns) == list(memory_page.columns)
+            assert sql_page.astype(str).to_numpy().tolist() == memory_page.astype(str).to_numpy().tolist(), query
+            np.testing.assert_array_equal(sql_flags, memory_flags)
+    finally:
+        sql.close()
@@ -0,0 +1,23 @@
+import os
+
+from fishlog.loader import parse_fishlog_bytes
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Fishlog.txt")
+
+
+def _sample_lines(count):
+    with open(SAMPLE_PATH, "rb") as fh:
+        return [next(fh) for _ in range(count)]
+
+
+def test_undecodable_lines_are_quarantined():
+    # Байт не в UTF-8 відхиляє лише свій рядок (з номером), решта рядків розбирається
+    lines = _sample_lines(20)
+    lines[3] = lines[3][:5] + b"\xff" + lines[3][5:]
+    lines[12] = lines[12][:3] + b"\xd0\n"
+    # Окремий \r pyarrow вважає кінцем рядка — такий рядок теж іде в карантин, а не ламає зіставлення
+    lines[9] = lines[9].replace(b":", b"\r", 1)
+    df, quarantine = parse_fishlog_bytes(b"".join(lines), first_line=101)
+    assert len(df) == 17
+    assert quarantine["line"].tolist() == [104, 110, 113]
+    assert quarantine["reason"].tolist() == ["encoding", "columns", "encoding"]
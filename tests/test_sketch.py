@@ -0,0 +1,30 @@
+import os
+
+from fishlog.loader import FishlogFollower
+from fishlog.records import quantile_flags
+from fishlog.sketch import frame_sketches
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Fishlog.txt")
+
+
+def _sample_lines(count):
+    with open(SAMPLE_PATH, encoding="utf-8") as fh:
+        return [next(fh) for _ in range(count)]
+
+
+def test_empty_location_does_not_break_sketches(tmp_path):
+    # Рядок з порожньою локацією (код категорії -1) не повинен ламати ескізи й позначки трофеїв
+    path = tmp_path / "Fishlog.txt"
+    path.write_text("Плотва:557:Червь:Озеро::1047:8-10:200\n" + "".join(_sample_lines(50)), encoding="utf-8")
+    follower = FishlogFollower(str(path), snapshot=False)
+    follower.refresh()
+    assert len(follower.df) == 51
+    assert follower.df["location"].cat.codes.iloc[0] == -1
+
+    sketches = frame_sketches(follower.df)
+    for breakdown in ("fish", "base", "location"):
+        flags = quantile_flags(follower.df, 0.9, breakdown)
+        assert len(flags) == 51
+    # Запис без локації не належить жодній групі — трофеєм на рівні локації він не буде
+    assert quantile_flags(follower.df, 0.9, "location")[0] == 0
+    assert sketches["location"].counts.sum() == 50
@@ -0,0 +1,33 @@
+import os
+
+from fishlog.loader import FishlogFollower
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Fishlog.txt")
+
+
+def _sample_lines(count):
+    with open(SAMPLE_PATH, encoding="utf-8") as fh:
+        return [next(fh) for _ in range(count)]
+
+
+def test_two_followers_share_snapshot(tmp_path):
+    # Два спостерігачі (напр. app1.py і main.py) дочитують той самий хвіст — знімок не задвоює рядки
+    lines = _sample_lines(151)
+    path = tmp_path / "Fishlog.txt"
+    path.write_text("".join(lines[:100]), encoding="utf-8")
+    first = FishlogFollower(str(path))
+    first.refresh()
+    second = FishlogFollower(str(path))
+    second.refresh()
+    assert len(first.df) == len(second.df) == 100
+
+    with open(path, "a", encoding="utf-8") as fh:
+        fh.write("".join(lines[100:]))
+    first.refresh()
+    second.refresh()
+    assert len(first.df) == len(second.df) == 151
+
+    restored = FishlogFollower(str(path))
+    restored.refresh()
+    assert len(restored.df) == 151
+    assert restored.lines == 151